@@ -0,0 +1,50 @@
+# import dependencies
+import os
+import json
+import random
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# sentences added to the ones of output.json so every template has hits and misses
+EXTRA_SENTENCES = [
+    "Steve Jobs was born on February 24, 1955 in San Francisco.",
+    "In 2006, Google bought YouTube for 1.65 billion dollars.",
+    "Richardson is a city in Texas.",
+    "The company reported higher revenue in the third quarter.",
+    "Most of the shares were held by institutional investors.",
+    "He studied economics at Columbia Business School.",
+]
+
+def sample_sentences():
+    """
+    Sentences of the extractions in output.json, followed by EXTRA_SENTENCES
+    """
+    with open(os.path.join(ROOT, 'output.json')) as file:
+        outputs = json.load(file)
+    sents = []
+    for output in outputs:
+        for extraction in output['extractions']:
+            if extraction['sentences'] not in sents:
+                sents.append(extraction['sentences'])
+    return sents + [s for s in EXTRA_SENTENCES if s not in sents]
+
+def synthetic_articles(n_articles=20, n_sentences=40, seed=0):
+    """
+    Deterministic synthetic corpus drawn from sample_sentences
+    Returns:
+        articles : list of (str, str)
+            A list of (title, text) pairs
+    """
+    rng = random.Random(seed)
+    sents = sample_sentences()
+    return [('{}.txt'.format(i), " ".join(rng.choice(sents) for _ in range(n_sentences)))
+            for i in range(n_articles)]
+
+def write_articles(articles, wiki_file_dir):
+    """
+    Write (title, text) pairs as .txt files, so reading the corpus can be measured too
+    """
+    os.makedirs(wiki_file_dir, exist_ok=True)
+    for title, text in articles:
+        with open(os.path.join(wiki_file_dir, title), 'w', encoding='latin-1', errors='replace') as file:
+            file.write(text)
@@ -0,0 +1,164 @@
+# import dependencies
+import os
+import sys
+import argparse
+import json
+import time
+import resource
+import tempfile
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from corpus import read_wiki_dir
+from features import TEMPLATES
+from nlp import NLP
+from storage import JsonlWriter
+from templates import TemplateEngine
+from bench_data import synthetic_articles, write_articles
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+class StageTimer(object):
+    """
+    StageTimer: per-article latency of each pipeline stage
+    """
+    def __init__(self):
+        self.latencies = OrderedDict()
+
+    def time(self, stage, fn, *args):
+        """
+        Call fn(*args), recording its latency under stage
+        """
+        start = time.perf_counter()
+        result = fn(*args)
+        self.latencies.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def report(self):
+        return OrderedDict((stage, {'total_s' : sum(values),
+                'mean_ms' : 1000 * sum(values) / len(values),
+                'p50_ms' : 1000 * _percentile(values, 0.5),
+                'p95_ms' : 1000 * _percentile(values, 0.95)})
+                for stage, values in self.latencies.items())
+
+def run(wiki_file_dir, templates=None):
+    """
+    Run the pipeline stage by stage over a corpus
+    Args:
+        wiki_file_dir : str
+            Directory with Wikipedia articles as .txt files
+        templates : list of str
+            Templates to fill, defaults to every template
+    Returns:
+        _ : dict
+            Machine-readable benchmark result
+    """
+    templates = list(TEMPLATES) if templates is None else templates
+    nlp = NLP(templates=templates).load()    # model load time is left out of the stage timings
+    # one engine per template gives the latency of each template on its own
+    engines = [(name, TemplateEngine([TEMPLATES[name]])) for name in templates]
+
+    timer = StageTimer()
+    articles, n_tokens = 0, 0
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp, JsonlWriter(os.path.join(tmp, 'output.jsonl')) as writer:
+        reader = read_wiki_dir(wiki_file_dir)
+        while True:
+            article = timer.time('read', next, reader, None)
+            if article is None:
+                break
+            title, text = article
+
+            doc = timer.time('parse', nlp._parse, text)
+            sents, tokens, features = timer.time('features', nlp._extract_doc, doc)
+            for name, engine in engines:
+                timer.time('fill_' + name, engine.fill, sents, features)
+            output = timer.time('fill', nlp.fill, title, sents, features)
+            timer.time('write', writer.write, output)
+
+            articles += 1
+            n_tokens += len(tokens)
+    elapsed = time.perf_counter() - start
+
+    return OrderedDict([('model', nlp._model),
+            ('templates', templates),
+            ('articles', articles),
+            ('tokens', n_tokens),
+            ('elapsed_s', elapsed),
+            ('articles_per_sec', articles / elapsed if elapsed else 0.0),
+            ('tokens_per_sec', n_tokens / elapsed if elapsed else 0.0),
+            ('peak_rss_mb', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),   # KB on Linux
+            ('stages', timer.report())])
+
+def compare(result, baseline, tolerance):
+    """
+    Regressions of a result against a baseline
+    Returns:
+        regressions : list of str
+    """
+    regressions = []
+    for key in ['articles_per_sec', 'tokens_per_sec']:
+        if result[key] < baseline[key] * (1 - tolerance):
+            regressions.append('{}: {:.2f} < {:.2f}'.format(key, result[key], baseline[key]))
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append('peak_rss_mb: {:.1f} > {:.1f}'.format(result['peak_rss_mb'], baseline['peak_rss_mb']))
+    for stage, stats in result['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base is not None and stats['mean_ms'] > base['mean_ms'] * (1 + tolerance):
+            regressions.append('{} mean: {:.2f}ms > {:.2f}ms'.format(stage, stats['mean_ms'], base['mean_ms']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark the extraction pipeline with per-stage timings')
+    parser.add_argument('-w', '--wiki', metavar='<path>', default=None,
+                        help='Directory of Wikipedia articles (.txt files). Defaults to the synthetic corpus.')
+    parser.add_argument('--articles', type=int, default=20,
+                        help='Number of synthetic articles.')
+    parser.add_argument('--sentences', type=int, default=40,
+                        help='Number of sentences per synthetic article.')
+    parser.add_argument('-t', '--templates', nargs='+', default=None,
+                        help='Templates to fill. Defaults to all of them.')
+    parser.add_argument('--name', default=None,
+                        help='Baseline name, defaults to "synthetic" or the corpus directory name.')
+    parser.add_argument('--save', action='store_true',
+                        help='Save the result as the baseline of this corpus.')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare with the saved baseline of this corpus, exit with 1 on regression.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative slowdown allowed by --compare.')
+    args = parser.parse_args()
+
+    name = args.name or (os.path.basename(os.path.normpath(args.wiki)) if args.wiki else 'synthetic')
+    path = os.path.join(BASELINES, name + '.json')
+    # checked before the benchmark runs, a missing baseline is recorded with --save first
+    if args.compare and not args.save and not os.path.isfile(path):
+        parser.error('no baseline {} to compare with, record it first with --save on the reference build'.format(path))
+    if args.wiki:
+        result = run(args.wiki, args.templates)
+    else:
+        with tempfile.TemporaryDirectory() as wiki_file_dir:
+            write_articles(synthetic_articles(args.articles, args.sentences), wiki_file_dir)
+            result = run(wiki_file_dir, args.templates)
+    result['name'] = name
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(result, file, indent=2)
+        print("Saved baseline "+path)
+    if args.compare:
+        with open(path) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("regression: "+regression)
+        if regressions:
+            sys.exit(1)
+        print("No regression against "+path)
+
+if __name__ == '__main__':
+    main()
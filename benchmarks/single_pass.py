@@ -0,0 +1,64 @@
+# import dependencies
+import os
+import sys
+import argparse
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from corpus import read_wiki_dir
+from nlp import NLP
+from bench_data import sample_sentences
+
+def load_articles(wiki_file_dir=None, repeat=20):
+    """
+    Load articles to benchmark on
+    Args:
+        wiki_file_dir : str
+            Directory with Wikipedia articles as .txt files. If None, a synthetic article is built
+            from the sentences in output.json
+        repeat : int
+            Number of times the synthetic sentences are repeated
+    Returns:
+        articles : list of (str, str)
+            A list of (title, text) pairs
+    """
+    if wiki_file_dir is not None:
+        return list(read_wiki_dir(wiki_file_dir))
+    return [('synthetic.txt', " ".join(sample_sentences() * repeat))]
+
+def run(nlp, articles):
+    """
+    Extract features and fill templates for every article
+    Returns:
+        elapsed : float
+            Wall-clock time in seconds
+        outputs : list
+            A list of templates per article
+    """
+    start = time.perf_counter()
+    outputs = []
+    for title, text in articles:
+        sents, tokens, features = nlp.extract(text)
+        outputs.append(nlp.fill(title, sents, features))
+    return time.perf_counter() - start, outputs
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark single-pass feature extraction against per-sentence re-parsing')
+    parser.add_argument('-w', '--wiki', metavar='<path>', default=None,
+                        help='Directory of Wikipedia articles (.txt files). Defaults to a synthetic article.')
+    parser.add_argument('-r', '--repeat', type=int, default=20,
+                        help='Number of repetitions of the synthetic sentences.')
+    args = parser.parse_args()
+
+    articles = load_articles(args.wiki, args.repeat)
+    reparse_time, reparse_outputs = run(NLP(single_pass=False).load(), articles)
+    single_time, single_outputs = run(NLP(single_pass=True).load(), articles)
+
+    print("Articles: {}".format(len(articles)))
+    print("Re-parse:    {:.3f}s".format(reparse_time))
+    print("Single-pass: {:.3f}s".format(single_time))
+    print("Speedup:     {:.2f}x".format(reparse_time / single_time))
+    print("Same templates: {}".format(reparse_outputs == single_outputs))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# import dependencies
+import os
+import sys
+import argparse
+import json
+import time
+import subprocess
+import tempfile
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_command(argv, repeat):
+    """
+    Wall time of a command run in a fresh interpreter
+    Args:
+        argv : list of str
+            Arguments of python3
+        repeat : int
+            Number of runs
+    Returns:
+        _ : dict
+            Median and min in milliseconds, and the exit code of the last run
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        code = subprocess.call([sys.executable] + argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(1000 * (time.perf_counter() - start))
+    times.sort()
+    return OrderedDict([('median_ms', times[len(times) // 2]),
+            ('min_ms', times[0]),
+            ('exit_code', code)])
+
+def run(repeat):
+    """
+    Time the short invocations of main.py, none of which should load the language model
+    Returns:
+        _ : dict
+            Timings per invocation, with the bare interpreter start as reference
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        empty = os.path.join(tmp, 'empty')
+        os.makedirs(empty)
+        output = os.path.join(tmp, 'output.json')
+        cases = OrderedDict([('python', ['-c', 'pass']),
+                ('import main', ['-c', 'import main']),
+                ('--help', ['main.py', '--help']),
+                ('argument error', ['main.py']),
+                ('missing input', ['main.py', '-w', os.path.join(tmp, 'missing')]),
+                ('empty input', ['main.py', '-w', empty, '-o', output]),
+                ('empty input, 4 workers', ['main.py', '-w', empty, '-o', output, '--workers', '4'])])
+        return OrderedDict((name, time_command(argv, repeat)) for name, argv in cases.items())
+
+def main():
+    parser = argparse.ArgumentParser('Benchmark the startup time of short main.py invocations')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs per invocation.')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Exit with 1 if the median of an invocation is over this many milliseconds.')
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print(json.dumps(result, indent=2))
+
+    if args.budget_ms is not None:
+        over = [name for name, stats in result.items() if stats['median_ms'] > args.budget_ms]
+        for name in over:
+            print("over budget: {} {:.1f}ms > {:.1f}ms".format(name, result[name]['median_ms'], args.budget_ms))
+        if over:
+            sys.exit(1)
+        print("Every invocation within {:.1f}ms".format(args.budget_ms))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+# import dependencies
+import os
+import json
+import mmap
+import hashlib
+from array import array
+
+from profiler import timed
+
+# separator of the paragraphs of an article
+PARAGRAPH_SEP = "\n\n"
+
+def list_wiki_files(wiki_file_dir):
+    """
+    List the article file names of a directory, in sorted order
+    Args:
+        wiki_file_dir : str
+            Directory path containing Wikipedia articles as .txt files.
+    Returns:
+        _ : list of str
+    """
+    return sorted(entry.name for entry in os.scandir(wiki_file_dir) if entry.is_file())
+
+@timed('io.read')
+def read_wiki_file(path):
+    """
+    Read an article
+    Args:
+        path : str
+    Returns:
+        _ : str
+            Text of the article, its paragraphs separated by PARAGRAPH_SEP
+    """
+    return PARAGRAPH_SEP.join(read_wiki_paragraphs(path))
+
+def read_wiki_paragraphs(path):
+    """
+    Read the paragraphs of an article: every non-blank line of the file
+    Args:
+        path : str
+    Returns:
+        _ : list of str
+    """
+    with open(path, encoding='latin-1') as wiki_file:
+        return [line.strip() for line in wiki_file if line.strip()]
+
+def split_paragraphs(text):
+    """
+    Paragraphs of an article read by read_wiki_file
+    Args:
+        text : str
+    Returns:
+        _ : list of str
+    """
+    return [paragraph for paragraph in text.split(PARAGRAPH_SEP) if paragraph.strip()]
+
+def read_wiki_dir(wiki_file_dir, files=None):
+    """
+    Read the articles of a directory, one file at a time
+    Args:
+        wiki_file_dir : str
+            Directory path containing Wikipedia articles as .txt files.
+        files : iterable of str
+            File names to read, defaults to list_wiki_files(wiki_file_dir)
+    Returns:
+        _ : generator of (str, str)
+            (file name, text) of the articles
+    """
+    files = list_wiki_files(wiki_file_dir) if files is None else files
+    for file in files:
+        yield file, read_wiki_file(os.path.join(wiki_file_dir, file))
+
+def title_hash(title):
+    """
+    Stable 64-bit hash of an article title, kept in the index of a dump to shard it without decoding it
+    Args:
+        title : str
+    Returns:
+        _ : int
+            The same in every process and on every machine
+    """
+    return int.from_bytes(hashlib.md5(title.encode('utf-8')).digest()[:8], 'big')
+
+def shard_of(title, n):
+    """
+    Shard of an article among n, from a stable hash of its title
+    Args:
+        title : str
+        n : int
+    Returns:
+        _ : int
+            In [0, n)
+    """
+    return title_hash(title) % n
+
+def parse_shard(value):
+    """
+    Parse a shard given as 'i/N'
+    Returns:
+        _ : (int, int)
+    """
+    try:
+        i, n = (int(x) for x in value.split('/'))
+    except ValueError:
+        raise ValueError("shard must be i/N, got {}".format(value))
+    if not 0 <= i < n:
+        raise ValueError("shard index must be in [0, N), got {}".format(value))
+    return i, n
+
+class WikiDir(object):
+    """
+    WikiDir: corpus of one .txt file per article
+    """
+    def __init__(self, wiki_file_dir):
+        """
+        Constructor
+        Args:
+            wiki_file_dir : str
+                Directory path containing Wikipedia articles as .txt files.
+        """
+        self.path = wiki_file_dir
+        self.files = list_wiki_files(wiki_file_dir)
+
+    def __len__(self):
+        return len(self.files)
+
+    def nbytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, file)) for file in self.files)
+
+    def articles(self, skip=None, shard=None):
+        """
+        Args:
+            skip : callable
+                skip(file name, mtime, size) is called before reading each file, which is left out if it
+                returns True
+            shard : (int, int)
+                If given as (i, N), only the files whose name hashes to shard i of N are read
+        Returns:
+            _ : generator of (str, str)
+                (file name, text) of the articles, one file at a time
+        """
+        files = self.files
+        if shard is not None:
+            files = [file for file in files if shard_of(file, shard[1]) == shard[0]]
+        if skip is None:
+            return read_wiki_dir(self.path, files)
+        return read_wiki_dir(self.path, (file for file in files if not self._skip(file, skip)))
+
+    def _skip(self, file, skip):
+        stat = os.stat(os.path.join(self.path, file))
+        return skip(file, stat.st_mtime_ns, stat.st_size)
+
+    def close(self):
+        pass    # files are opened one at a time, while reading them
+
+class DumpFile(object):
+    """
+    DumpFile: memory-mapped corpus file holding one JSON record {"title": ..., "text": ...} per line
+    Record boundaries and title hashes are kept in an index, saved next to the dump as <path>.idx, so any
+    record range can be reached without scanning the file and the records of other shards are left out
+    without being decoded. Records are decoded one at a time, straight from the mapped pages.
+    """
+    def __init__(self, path):
+        """
+        Constructor
+        Args:
+            path : str
+                Path of the dump file
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+        self._offsets, self._hashes = self._load_index()
+
+    def _load_index(self):
+        """
+        Load the index, building it if missing or older than the dump
+        The index file holds the offsets followed by the hashes, both as array('Q').
+        Returns:
+            offsets : array('Q')
+                Start of every record, followed by the end of the file
+            hashes : array('Q')
+                title_hash of the title of every record, 0 for a blank line
+        """
+        index_path = self.path + '.idx'
+        if os.path.isfile(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(self.path):
+            values = array('Q')
+            with open(index_path, 'rb') as file:
+                values.frombytes(file.read())
+            # n + 1 offsets, the last one being the size of the dump, then n hashes
+            n = len(values) // 2
+            if len(values) % 2 and values[n] == self._size:
+                return values[:n + 1], values[n + 1:]
+
+        offsets = array('Q', [0])
+        hashes = array('Q')
+        pos = 0
+        while pos < self._size:
+            end = self._mm.find(b'\n', pos)
+            end = self._size if end == -1 else end + 1
+            line = self._mm[pos:end]
+            hashes.append(title_hash(json.loads(line)['title']) if line.strip() else 0)
+            pos = end
+            offsets.append(pos)
+        try:
+            with open(index_path, 'wb') as file:
+                offsets.tofile(file)
+                hashes.tofile(file)
+        except OSError:
+            pass    # read-only location, the index is rebuilt next time
+        return offsets, hashes
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def nbytes(self):
+        return self._size
+
+    def record(self, i):
+        """
+        Decode record i
+        Returns:
+            _ : (str, str)
+                (title, text) of the article, its paragraphs separated by PARAGRAPH_SEP. None for a blank line
+        """
+        view = memoryview(self._mm)[self._offsets[i]:self._offsets[i + 1]]
+        try:
+            line = str(view, 'utf-8')
+        finally:
+            view.release()
+        if not line.strip():
+            return None
+        record = json.loads(line)
+        paragraphs = [paragraph.strip() for paragraph in record['text'].splitlines() if paragraph.strip()]
+        return record['title'], PARAGRAPH_SEP.join(paragraphs)
+
+    def articles(self, start=0, stop=None, skip=None, shard=None):
+        """
+        Args:
+            start : int
+                First record
+            stop : int
+                Record after the last one, defaults to the end of the dump
+            skip : callable
+                skip(title, None, size) is called on each decoded record, which is left out if it returns True.
+                Records have no modification time of their own
+            shard : (int, int)
+                If given as (i, N), only the records whose title hashes to shard i of N are decoded
+        Returns:
+            _ : generator of (str, str)
+                (title, text) of the articles, decoded as they are reached
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            if shard is not None and self._hashes[i] % shard[1] != shard[0]:
+                continue
+            article = self.record(i)
+            if article is None:
+                continue
+            if skip is not None and skip(article[0], None, self._offsets[i + 1] - self._offsets[i]):
+                continue
+            yield article
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+def open_corpus(path):
+    """
+    Open a corpus: a directory of .txt files, or a dump file of JSON records
+    Args:
+        path : str
+    Returns:
+        _ : WikiDir or DumpFile
+    """
+    return DumpFile(path) if os.path.isfile(path) else WikiDir(path)
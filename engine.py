@@ -0,0 +1,202 @@
+# import dependencies
+import gc
+import multiprocessing
+from collections import deque
+from itertools import islice, chain
+
+from corpus import split_paragraphs
+from features import TEMPLATES
+from nlp import NLP
+from profiler import get_profiler
+
+# NLP pipeline owned by each worker process, loaded once by _init_worker
+_worker_nlp = None
+
+def _init_worker(nlp_kwargs, profile, nlp=None):
+    """
+    Load the NLP pipeline in a worker process
+    Args:
+        nlp_kwargs : dict
+            Arguments of the NLP pipeline
+        profile : bool
+            Whether to enable the profiler
+        nlp : NLP
+            Pipeline already loaded by the parent, only given to forked workers which share it copy-on-write
+    """
+    global _worker_nlp
+    if profile:
+        get_profiler().reset()    # a forked worker starts with a copy of the stats of its parent
+        get_profiler().enable()
+    _worker_nlp = nlp if nlp is not None else NLP(**nlp_kwargs)
+
+def _process_chunk(args):
+    """
+    Parse a chunk of articles and fill their templates inside a worker process
+    Args:
+        args : tuple of (list of (str, str), int)
+            Chunk of (title, text) pairs and the nlp.pipe batch size
+    Returns:
+        outputs : list
+            A list of templates per article, in chunk order
+        stats : dict
+            Profiler stats recorded for the chunk, None if profiling is disabled
+    """
+    chunk, batch_size = args
+    outputs = list(_fill_stream(_worker_nlp, chunk, batch_size))
+    profiler = get_profiler()
+    return outputs, profiler.snapshot() if profiler.enabled else None
+
+def _fill_stream(nlp, inputs, batch_size):
+    """
+    Parse a stream of articles with nlp.pipe and fill their templates
+    """
+    for title, sents, tokens, features in nlp.pipe(inputs, batch_size=batch_size):
+        yield nlp.fill(title, sents, features)
+
+def _paragraph_units(inputs):
+    """
+    Split a stream of articles into a stream of paragraphs, each keyed by (title, index, count)
+    An article without text still gives one empty unit, so it gets an output.
+    """
+    for title, text in inputs:
+        paragraphs = split_paragraphs(text) or [""]
+        for k, paragraph in enumerate(paragraphs):
+            yield (title, k, len(paragraphs)), paragraph
+
+def _chunks(inputs, size):
+    """
+    Split a stream into lists of at most size items
+    """
+    inputs = iter(inputs)
+    while True:
+        chunk = list(islice(inputs, size))
+        if not chunk:
+            return
+        yield chunk
+
+class BatchEngine(object):
+    """
+    BatchEngine: streams (title, text) pairs through nlp.pipe and fills templates,
+    optionally spread over several worker processes
+    """
+    def __init__(self, batch_size=16, n_process=1, unit='article', fork=None, **nlp_kwargs):
+        """
+        Constructor
+        Args:
+            batch_size : int
+                Number of articles parsed per nlp.pipe batch, also the number of articles sent to a worker at once
+            n_process : int
+                Number of worker processes. 1 runs in the current process, 0 uses every core
+            unit : str
+                'article' parses whole articles. 'paragraph' parses every paragraph as an independent unit,
+                spreading the paragraphs of large articles over the workers, and merges the templates per
+                article; coreference then stays within a paragraph
+            fork : bool
+                Load the model once in this process and fork the workers from it, so they start without
+                loading anything and share the model memory copy-on-write. Defaults to True where the fork
+                start method is available (Linux); otherwise every worker loads the model itself
+            nlp_kwargs : dict
+                Arguments of the NLP pipeline of every process (templates, parse_cache, max_chars, ...)
+        """
+        self._batch_size = max(1, batch_size)
+        self._n_process = n_process if n_process > 0 else multiprocessing.cpu_count()
+        self._unit = unit
+        self._nlp_kwargs = nlp_kwargs
+        self._order = {name : i for i, name in enumerate(nlp_kwargs.get('templates') or TEMPLATES)}
+        self._fork = 'fork' in multiprocessing.get_all_start_methods() if fork is None else fork
+        self._nlp = NLP(**nlp_kwargs) if self._n_process == 1 or self._fork else None
+
+    def load(self):
+        """
+        Load the model of the in-process pipeline now rather than on the first article
+        Returns:
+            self : BatchEngine
+        """
+        if self._nlp is not None:
+            self._nlp.load()
+        return self
+
+    def run(self, inputs):
+        """
+        Extract templates for a stream of articles
+        Args:
+            inputs : iterable of (str, str)
+                Stream of (title, text) pairs
+        Returns:
+            _ : generator of dict
+                Templates per article, in input order
+        """
+        if self._unit == 'paragraph':
+            yield from self._merge_paragraphs(self._run_units(_paragraph_units(inputs)))
+        else:
+            yield from self._run_units(inputs)
+
+    def _run_units(self, inputs):
+        """
+        Extract templates for a stream of (key, text) units, articles or paragraphs
+        Returns:
+            _ : generator of dict
+                Templates per unit, in input order, 'document' holding the unit key
+        """
+        if self._n_process == 1:
+            yield from _fill_stream(self._nlp, inputs, self._batch_size)
+            return
+
+        # keep a bounded window of chunks in flight, Pool.imap would read the whole input ahead.
+        # Results are taken from the front of the window, so the output order is deterministic
+        chunks = _chunks(inputs, self._batch_size)
+        first = next(chunks, None)
+        if first is None:
+            return    # no input, no worker has to load the model
+
+        if self._fork:
+            # arguments of forked workers are inherited, not pickled
+            context = multiprocessing.get_context('fork')
+            initargs = (self._nlp_kwargs, get_profiler().enabled, self._nlp.load())
+        else:
+            context = multiprocessing.get_context()
+            initargs = (self._nlp_kwargs, get_profiler().enabled)
+
+        # objects frozen while forking are left out of the garbage collections of the workers, which would
+        # otherwise touch and copy their pages. This process unfreezes them once the workers are started
+        freeze = self._fork and hasattr(gc, 'freeze')
+        if freeze:
+            gc.freeze()
+        try:
+            pool = context.Pool(self._n_process, initializer=_init_worker, initargs=initargs)
+        finally:
+            if freeze:
+                gc.unfreeze()
+
+        pending = deque()
+        with pool:
+            for chunk in chain([first], chunks):
+                pending.append(pool.apply_async(_process_chunk, ((chunk, self._batch_size),)))
+                if len(pending) >= 2 * self._n_process:
+                    yield from self._collect(pending.popleft())
+            while pending:
+                yield from self._collect(pending.popleft())
+
+    def _merge_paragraphs(self, outputs):
+        """
+        Merge the templates of consecutive paragraphs into one output per article
+        Extractions stay grouped by template, in template order, then in paragraph order.
+        """
+        extractions = []
+        for output in outputs:
+            title, k, n = output['document']
+            extractions.extend(output['extractions'])
+            if k == n - 1:
+                extractions.sort(key=lambda extraction: self._order[extraction['template']])
+                yield {'document' : title,
+                        'extractions' : extractions}
+                extractions = []
+
+    def _collect(self, result):
+        """
+        Wait for the result of a chunk, merging the profiler stats of its worker
+        """
+        outputs, stats = result.get()
+        if stats is not None:
+            get_profiler().merge(stats)
+        return outputs
@@ -0,0 +1,461 @@
+# import dependencies
+from array import array
+from bisect import bisect_left, bisect_right
+
+# token attribute read for each string feature, stored as interned ids
+STRING_ATTRS = {'text' : 'text',
+        'lem' : 'lemma_',
+        'pos' : 'pos_',
+        'tag' : 'tag_',
+        'dep' : 'dep_',
+        'ent_type' : 'ent_type_'}
+
+class StringTable(object):
+    """
+    StringTable: interns the strings of a document, one id per distinct string
+    """
+    def __init__(self):
+        self._ids = {}
+        self.strings = []
+
+    def intern(self, string):
+        """
+        Id of a string, added to the table if new
+        """
+        try:
+            return self._ids[string]
+        except KeyError:
+            self._ids[string] = len(self.strings)
+            self.strings.append(string)
+            return self._ids[string]
+
+    def __getitem__(self, id):
+        return self.strings[id]
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getstate__(self):
+        # the reverse mapping is rebuilt on load
+        return self.strings
+
+    def __setstate__(self, strings):
+        self.strings = strings
+        self._ids = {string : i for i, string in enumerate(strings)}
+
+class TokenView(object):
+    """
+    TokenView: read-only token of a FeatureStore sentence, standing in for a spaCy Token
+    i is the index of the token in its sentence.
+    """
+    __slots__ = ('_store', '_sent', 'i')
+
+    def __init__(self, store, sent, i):
+        self._store = store
+        self._sent = sent
+        self.i = i
+
+    def _string(self, key):
+        return self._store.strings[self._store._columns[key][self._store.offsets[self._sent] + self.i]]
+
+    @property
+    def text(self):
+        return self._string('text')
+
+    @property
+    def lemma_(self):
+        return self._string('lem')
+
+    @property
+    def dep_(self):
+        return self._string('dep')
+
+    @property
+    def ent_type_(self):
+        return self._string('ent_type')
+
+    @property
+    def head(self):
+        return TokenView(self._store, self._sent, self._store._heads[self._store.offsets[self._sent] + self.i])
+
+    @property
+    def children(self):
+        for j in self._store.children(self._sent, self.i):
+            yield TokenView(self._store, self._sent, j)
+
+    @property
+    def subtree(self):
+        for j in self._store.subtree(self._sent, self.i):
+            yield TokenView(self._store, self._sent, j)
+
+    @property
+    def ancestors(self):
+        for j in self._store.ancestors(self._sent, self.i):
+            yield TokenView(self._store, self._sent, j)
+
+class _Column(object):
+    """
+    Per-sentence view of a column of a FeatureStore
+    """
+    def __init__(self, store, key):
+        self._store = store
+        self._key = key
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._store._sentence(self._key, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._store._sentence(self._key, i)
+
+class FeatureStore(object):
+    """
+    FeatureStore: compact columnar features of a document
+    Strings are interned once per document and stored as ids in typed arrays, with one offset
+    array giving the token range of each sentence. Indexing a feature by sentence returns the same
+    lists as the former list-of-lists features, and the store holds no spaCy object, so it is
+    cheap to pickle between processes.
+    """
+    def __init__(self, keys):
+        """
+        Constructor
+        Args:
+            keys : set of str
+                Features to store
+        """
+        self.strings = StringTable()
+        self.offsets = array('I', [0])
+        self._keys = set(keys)
+        self._columns = {key : array('I') for key in STRING_ATTRS if key in self._keys}
+        self._heads = array('I') if 'head' in self._keys or 'dep_root' in self._keys else None
+        if self._heads is not None:
+            # children of every token, left to right: those of token t of the document are
+            # _children[_child_offsets[t]:_child_offsets[t + 1]], as indices in its sentence
+            self._child_offsets = array('I', [0])
+            self._children = array('I')
+        self._roots = array('I') if 'dep_root' in self._keys else None
+        if 'ents' in self._keys:
+            self._ent_offsets = array('I', [0])
+            self._ent_text = array('I')
+            self._ent_label = array('I')
+            self._ent_chars = array('I')    # start and end character offset, interleaved
+            self._ent_tokens = array('I')    # start and end token index in the sentence, interleaved
+            self._token_ent = array('I')    # per token, 1 + index in its sentence of the entity covering it, 0 if none
+            # entity index: label id -> ids of the entities of the document with this label, in order
+            self._ents_by_label = {}
+        # coreference index, see set_coref
+        self._coref = None
+        self._coref_names = None
+        # inverted index of the lemmas: lemma id -> ids of the sentences containing it
+        self._lemma_index = {} if 'lem' in self._keys else None
+        self._extra = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def add_sentence(self, tokens, root, ents, offset):
+        """
+        Append the features of a sentence
+        Args:
+            tokens : spacy.tokens.Doc or spacy.tokens.Span
+                Tokens of the sentence
+            root : spacy.tokens.Token
+                Root of the dependency parse of the sentence
+            ents : iterable of spacy.tokens.Span
+                Named entities of the sentence
+            offset : int
+                Character offset of the sentence, subtracted from the entity offsets
+        """
+        intern = self.strings.intern
+        for key, column in self._columns.items():
+            attr = STRING_ATTRS[key]
+            column.extend(intern(getattr(tok, attr)) for tok in tokens)
+
+        if self._lemma_index is not None:
+            sent = len(self)
+            lemmas = self._columns['lem']
+            for id in set(lemmas[self.offsets[-1]:]):
+                self._lemma_index.setdefault(id, array('I')).append(sent)
+
+        start = tokens[0].i if len(tokens) else 0
+        if self._heads is not None:
+            # a token whose head is outside of the tokens, e.g. of a sentence trimmed at a window cut, is a root
+            heads = [tok.head.i - start if 0 <= tok.head.i - start < len(tokens) else j for j, tok in enumerate(tokens)]
+            self._heads.extend(heads)
+            self._add_children(heads)
+        if self._roots is not None:
+            self._roots.append(root.i - start)
+        if 'ents' in self._keys:
+            covering = [0] * len(tokens)
+            for k, ent in enumerate(ents):
+                label = intern(ent.label_)
+                self._ents_by_label.setdefault(label, array('I')).append(len(self._ent_text))
+                self._ent_text.append(intern(ent.text))
+                self._ent_label.append(label)
+                self._ent_chars.append(ent.start_char - offset)
+                self._ent_chars.append(ent.end_char - offset)
+                self._ent_tokens.append(ent.start - start)
+                self._ent_tokens.append(ent.end - start)
+                for j in range(ent.start - start, ent.end - start):
+                    covering[j] = k + 1
+            self._token_ent.extend(covering)
+            self._ent_offsets.append(len(self._ent_text))
+        self.offsets.append(self.offsets[-1] + len(tokens))
+
+    def _add_children(self, heads):
+        """
+        Append the children index of a sentence, bucketing its tokens by head
+        Args:
+            heads : list of int
+                Head of every token of the sentence, the root being its own head
+        """
+        counts = [0] * len(heads)
+        for j, head in enumerate(heads):
+            if head != j:
+                counts[head] += 1
+        first = end = self._child_offsets[-1]
+        slots = []    # next free position of the children of each token
+        for count in counts:
+            slots.append(end - first)
+            end += count
+            self._child_offsets.append(end)
+
+        children = [0] * (end - first)
+        for j, head in enumerate(heads):
+            if head != j:
+                children[slots[head]] = j
+                slots[head] += 1
+        self._children.extend(children)
+
+    def token(self, i, j):
+        """
+        Token j of sentence i
+        """
+        return TokenView(self, i, j)
+
+    def children(self, i, j):
+        """
+        Children of token j of sentence i
+        Returns:
+            _ : array of int
+                Indices of the children in the sentence, left to right
+        """
+        t = self.offsets[i] + j
+        return self._children[self._child_offsets[t]:self._child_offsets[t + 1]]
+
+    def subtree(self, i, j):
+        """
+        Tokens of the subtree of token j of sentence i, walked without recursion
+        Returns:
+            _ : list of int
+                Indices of the tokens in the sentence, in order, token j included
+        """
+        nodes = [j]
+        stack = [j]
+        while stack:
+            children = self.children(i, stack.pop())
+            nodes.extend(children)
+            stack.extend(children)
+        return sorted(nodes)
+
+    def ancestors(self, i, j):
+        """
+        Heads of token j of sentence i up to the root
+        Returns:
+            _ : list of int
+                Indices of the ancestors in the sentence, nearest first
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        nodes = []
+        head = self._heads[start + j]
+        while head != j and len(nodes) < end - start:
+            nodes.append(head)
+            j, head = head, self._heads[start + head]
+        return nodes
+
+    def entities(self, i, *labels):
+        """
+        Entities of sentence i with one of the labels, looked up in the entity index
+        Args:
+            i : int
+            labels : str
+                e.g. 'LOC', 'GPE'
+        Returns:
+            _ : list of int
+                Indices of the entities in the sentence, in order, as in features['ents'][i]
+        """
+        first, last = self._ent_offsets[i], self._ent_offsets[i + 1]
+        res = []
+        for label in labels:
+            ids = self._ents_by_label.get(self.strings._ids.get(label), ())
+            res.extend(k - first for k in ids[bisect_left(ids, first):bisect_left(ids, last)])
+        return sorted(res) if len(labels) > 1 else res
+
+    def entity_span(self, i, k):
+        """
+        Token span of entity k of sentence i
+        Returns:
+            _ : (int, int)
+                Start and end token index in the sentence
+        """
+        k += self._ent_offsets[i]
+        return self._ent_tokens[2 * k], self._ent_tokens[2 * k + 1]
+
+    def entity_at(self, i, j):
+        """
+        Entity covering token j of sentence i
+        Returns:
+            _ : int
+                Index of the entity in the sentence, None if the token is not part of an entity
+        """
+        k = self._token_ent[self.offsets[i] + j]
+        return k - 1 if k else None
+
+    def set_coref(self, clusters):
+        """
+        Attach the coreference clusters of the document, once every sentence is added, and index them
+        Each token of a mention is mapped to its cluster, and each cluster to the first named entity covering
+        the head of one of its mentions, main mention first, so that "The founder of Apple" is not named
+        "Apple".
+        Args:
+            clusters : list(list(tuple(int, int)))
+                (start, end) token spans of the mentions of each cluster, in document token indices
+        """
+        self._extra['coref'] = clusters
+        n = self.offsets[-1]
+        self._coref = array('I', bytes(4 * n))    # per token, 1 + id of its cluster, 0 if none
+        self._coref_names = array('i')    # per cluster, id of the entity naming it, -1 if none
+        for c, cluster in enumerate(clusters):
+            name = -1
+            for start, end in cluster:
+                end = min(end, n)
+                for t in range(start, end):
+                    if not self._coref[t]:
+                        self._coref[t] = c + 1
+                if name < 0 and start < end and 'ents' in self._keys:
+                    sent = bisect_right(self.offsets, start) - 1
+                    head = self._mention_head(sent, start, end)
+                    if self._token_ent[head]:
+                        name = self._ent_offsets[sent] + self._token_ent[head] - 1
+            self._coref_names.append(name)
+
+    def _mention_head(self, i, start, end):
+        """
+        Syntactic head of a mention: its first token whose head is outside of the mention, or the root
+        Args:
+            i : int
+                Sentence of the mention
+            start, end : int
+                Document token indices of the mention
+        Returns:
+            _ : int
+                Document token index of the head, the first token if the heads are not stored
+        """
+        if self._heads is None:
+            return start
+        base = self.offsets[i]
+        for t in range(start, end):
+            head = base + self._heads[t]
+            if head == t or not start <= head < end:
+                return t
+        return start
+
+    def resolve(self, i, j):
+        """
+        Named entity a token refers to through coreference, e.g. "Smith" for "He"
+        Returns:
+            _ : (str, str)
+                Text and label of the entity naming the cluster of token j of sentence i, None if the token
+                is in no cluster or its cluster mentions no entity
+        """
+        if self._coref is None:
+            return None
+        c = self._coref[self.offsets[i] + j]
+        if not c or self._coref_names[c - 1] < 0:
+            return None
+        k = self._coref_names[c - 1]
+        return self.strings[self._ent_text[k]], self.strings[self._ent_label[k]]
+
+    def sentences_with(self, *lemmas):
+        """
+        Sentences containing at least one of the lemmas
+        Args:
+            lemmas : str
+        Returns:
+            _ : list of int
+                Sentence ids in increasing order
+        """
+        ids = (self.strings._ids.get(lemma) for lemma in lemmas)
+        sents = set()
+        for id in ids:
+            if id is not None:
+                sents.update(self._lemma_index.get(id, ()))
+        return sorted(sents)
+
+    def _sentence(self, key, i):
+        """
+        Feature of sentence i, in the same shape as the former list-of-lists features
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if key in self._columns:
+            strings = self.strings.strings
+            return [strings[x] for x in self._columns[key][start:end]]
+        if key == 'ents':
+            strings = self.strings.strings
+            return [(strings[self._ent_text[j]], self._ent_chars[2 * j], self._ent_chars[2 * j + 1], strings[self._ent_label[j]])
+                    for j in range(self._ent_offsets[i], self._ent_offsets[i + 1])]
+        if key == 'head':
+            return list(self._heads[start:end])
+        if key == 'dep_root':
+            return TokenView(self, i, self._roots[i])
+        raise KeyError(key)
+
+    def keys(self):
+        keys = set(self._columns) | set(self._extra)
+        if self._roots is not None:
+            keys.add('dep_root')
+        if self._heads is not None:
+            keys.add('head')
+        if 'ents' in self._keys:
+            keys.add('ents')
+        return keys
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        if key in self._extra:
+            return self._extra[key]
+        if key not in self.keys():
+            raise KeyError(key)
+        return _Column(self, key)
+
+    def __setitem__(self, key, value):
+        """
+        Attach a feature that is not stored in columns, e.g. document-level coreference clusters
+        """
+        self._extra[key] = value
+
+    def nbytes(self):
+        """
+        Approximate size of the columns in bytes, strings excluded
+        """
+        arrays = [self.offsets] + list(self._columns.values())
+        arrays += [a for a in (self._heads, self._roots) if a is not None]
+        if self._heads is not None:
+            arrays += [self._child_offsets, self._children]
+        if 'ents' in self._keys:
+            arrays += [self._ent_offsets, self._ent_text, self._ent_label, self._ent_chars, self._ent_tokens, self._token_ent]
+            arrays += list(self._ents_by_label.values())
+        if self._coref is not None:
+            arrays += [self._coref, self._coref_names]
+        return sum(a.itemsize * len(a) for a in arrays)
@@ -0,0 +1,74 @@
+# import dependencies
+from collections import OrderedDict
+
+# spaCy pipeline components needed to compute each feature
+FEATURES = {'text' : (),
+        'lem' : ('tagger',),    # the spaCy 2 lemmatizer reads the POS tags
+        'pos' : ('tagger',),
+        'tag' : ('tagger',),
+        'dep' : ('parser',),
+        'head' : ('parser',),
+        'dep_root' : ('parser',),
+        'ents' : ('ner',),
+        'ent_type' : ('ner',),
+        'hypernyms' : (),
+        'hyponyms' : (),
+        'meronyms' : (),
+        'holonyms' : (),
+        'coref' : ('neuralcoref',)}
+
+# features computed from other features
+DEPENDS = {'dep_root' : ('text', 'lem', 'dep', 'ent_type', 'head'),    # read through TokenView
+        'hypernyms' : ('text',),
+        'hyponyms' : ('text',),
+        'meronyms' : ('text',),
+        'holonyms' : ('text',),
+        'coref' : ('head',)}    # clusters are named from the head of their mentions
+
+# components always kept: the parser sets the sentence boundaries
+REQUIRED_COMPONENTS = ('parser',)
+
+# template name -> TemplateSpec, in registration order
+TEMPLATES = OrderedDict()
+
+def register(spec):
+    """
+    Register a template
+    Args:
+        spec : TemplateSpec
+            Template, with the features it reads in spec.features
+    """
+    for feature in spec.features:
+        if feature not in FEATURES:
+            raise ValueError("unknown feature: {}".format(feature))
+    TEMPLATES[spec.name] = spec
+    return spec
+
+def resolve(templates=None):
+    """
+    Features needed by a set of templates
+    Args:
+        templates : list of str
+            Template names, defaults to every registered template
+    Returns:
+        features : set of str
+            Union of the features declared by the templates, with their dependencies
+    """
+    templates = list(TEMPLATES) if templates is None else templates
+    features = set()
+    for name in templates:
+        if name not in TEMPLATES:
+            raise ValueError("unknown template: {}".format(name))
+        features.update(TEMPLATES[name].features)
+    for feature in list(features):
+        features.update(DEPENDS.get(feature, ()))
+    return features
+
+def components(features):
+    """
+    spaCy pipeline components needed by a set of features
+    """
+    needed = set(REQUIRED_COMPONENTS)
+    for feature in features:
+        needed.update(FEATURES[feature])
+    return needed
@@ -0,0 +1,305 @@
+# import dependencies
+import os
+import sys
+import argparse
+import json
+import mmap
+import re
+import unicodedata
+from array import array
+
+from storage import read_jsonl
+
+# leading words dropped from the arguments before they are compared, e.g. "the Washington Post Company"
+DETERMINERS = ('the ', 'a ', 'an ')
+
+def normalize(text):
+    """
+    Normalized form of an argument, under which equal arguments are merged and looked up
+    Args:
+        text : str
+    Returns:
+        _ : str
+            Case-folded, NFKC-normalized text without leading determiner, possessive, surrounding
+            punctuation and repeated spaces, e.g. "Apple's" -> "apple"
+    """
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ' '.join(text.split())
+    text = text.strip(' .,;:!?"\'()[]')
+    text = re.sub(r"['’]s$", '', text)
+    for determiner in DETERMINERS:
+        if text.startswith(determiner):
+            text = text[len(determiner):]
+    return text
+
+def _read_outputs(path):
+    """
+    Articles of an output, either the JSON Lines file or the JSON list written by main.py
+    """
+    if path.endswith('.jsonl'):
+        return read_jsonl(path)
+    with open(path, encoding='utf-8') as file:
+        return iter(json.load(file))
+
+def _terms(extraction):
+    """
+    Index terms of an extraction: its template, each argument, and each argument in its slot
+    """
+    template = extraction['template']
+    yield 't\t' + template
+    for slot, value in extraction['arguments'].items():
+        if value:
+            yield 'a\t' + value
+            yield 's\t{}\t{}\t{}'.format(template, slot, value)
+
+def build_index(articles, index_dir):
+    """
+    Deduplicate the extractions of a corpus and write their inverted index
+    Extractions with the same template and normalized arguments are merged into one, keeping every
+    (document, sentence) they were found in.
+    Args:
+        articles : iterable of dict
+            Outputs of main.py, {"document", "extractions"} per article
+        index_dir : str
+            Directory of the index, created if missing. It holds
+                extractions.jsonl : one merged extraction per line, its id being its line number
+                extractions.idx : array('Q') of the line offsets of extractions.jsonl
+                postings.bin : array('I') of the extraction ids of every term, term after term
+                terms.txt : "term\\tstart\\tcount" lines sorted by term, start and count locating its postings
+                terms.idx : array('Q') of the line offsets of terms.txt
+    Returns:
+        count : int
+            Number of extractions after deduplication
+        total : int
+            Number of extractions read
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    ids = {}
+    extractions = []
+    postings = {}
+    total = 0
+    for article in articles:
+        for extraction in article['extractions']:
+            total += 1
+            arguments = {slot : normalize(value) if value else None for slot, value in extraction['arguments'].items()}
+            key = (extraction['template'], tuple(sorted(arguments.items())))
+            source = {'document' : article['document'], 'sentence' : extraction['sentences']}
+            if key in ids:
+                if source not in extractions[ids[key]]['sources']:
+                    extractions[ids[key]]['sources'].append(source)
+                continue
+            ids[key] = len(extractions)
+            merged = {'id' : len(extractions),
+                    'template' : extraction['template'],
+                    'arguments' : arguments,
+                    'text' : extraction['arguments'],    # surface forms of the first occurrence
+                    'sources' : [source]}
+            extractions.append(merged)
+            for term in set(_terms(merged)):
+                postings.setdefault(term, array('I')).append(merged['id'])
+
+    offsets = array('Q')
+    with open(os.path.join(index_dir, 'extractions.jsonl'), 'wb') as file:
+        for extraction in extractions:
+            offsets.append(file.tell())
+            file.write((json.dumps(extraction) + '\n').encode('utf-8'))
+        offsets.append(file.tell())
+    with open(os.path.join(index_dir, 'extractions.idx'), 'wb') as file:
+        offsets.tofile(file)
+
+    # terms sorted by their UTF-8 bytes, the order ExtractionIndex searches them in
+    line_offsets = array('Q')
+    start = 0
+    with open(os.path.join(index_dir, 'postings.bin'), 'wb') as postings_file, \
+            open(os.path.join(index_dir, 'terms.txt'), 'wb') as terms_file:
+        for term in sorted(postings, key=lambda term: term.encode('utf-8')):
+            ids_of_term = postings[term]
+            ids_of_term.tofile(postings_file)
+            line_offsets.append(terms_file.tell())
+            terms_file.write('{}\t{}\t{}\n'.format(term, start, len(ids_of_term)).encode('utf-8'))
+            start += len(ids_of_term)
+        line_offsets.append(terms_file.tell())
+    with open(os.path.join(index_dir, 'terms.idx'), 'wb') as file:
+        line_offsets.tofile(file)
+    return len(extractions), total
+
+class ExtractionIndex(object):
+    """
+    ExtractionIndex: read-only, memory-mapped index written by build_index
+    A term is found by binary search over the sorted term file and its postings are read straight from
+    the mapped postings file, so a lookup touches a few pages whatever the size of the index.
+    """
+    def __init__(self, index_dir):
+        """
+        Constructor
+        Args:
+            index_dir : str
+                Directory written by build_index
+        """
+        self._files = []
+        self._extractions = self._map(os.path.join(index_dir, 'extractions.jsonl'))
+        self._offsets = self._load(os.path.join(index_dir, 'extractions.idx'), 'Q')
+        self._postings = self._map(os.path.join(index_dir, 'postings.bin'))
+        self._terms = self._map(os.path.join(index_dir, 'terms.txt'))
+        self._term_offsets = self._load(os.path.join(index_dir, 'terms.idx'), 'Q')
+
+    def _map(self, path):
+        file = open(path, 'rb')
+        self._files.append(file)
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+
+    def _load(self, path, typecode):
+        values = array(typecode)
+        with open(path, 'rb') as file:
+            values.frombytes(file.read())
+        return values
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _term(self, i):
+        """
+        Term i of the sorted term file
+        Returns:
+            _ : (bytes, int, int)
+                Term, start and count of its postings
+        """
+        line = self._terms[self._term_offsets[i]:self._term_offsets[i + 1]].rstrip(b'\n')
+        term, start, count = line.rsplit(b'\t', 2)
+        return term, int(start), int(count)
+
+    def lookup(self, term):
+        """
+        Ids of the extractions of a term
+        Args:
+            term : str
+                e.g. 't\\tBUY', 'a\\tberkshire', 's\\tBUY\\t1\\tberkshire'
+        Returns:
+            _ : array('I')
+                Sorted extraction ids, empty if the term is unknown
+        """
+        key = term.encode('utf-8')
+        lo, hi = 0, len(self._term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        ids = array('I')
+        if lo < len(self._term_offsets) - 1:
+            found, start, count = self._term(lo)
+            if found == key:
+                ids.frombytes(self._postings[start * ids.itemsize:(start + count) * ids.itemsize])
+        return ids
+
+    def get(self, id):
+        """
+        Extraction of an id
+        Returns:
+            _ : dict
+                {"id", "template", "arguments", "text", "sources"}
+        """
+        return json.loads(self._extractions[self._offsets[id]:self._offsets[id + 1]].decode('utf-8'))
+
+    def query(self, template=None, argument=None, slot=None):
+        """
+        Ids of the extractions matching every given criterion
+        Args:
+            template : str
+                e.g. 'BUY'
+            argument : str
+                Argument value, normalized before the lookup
+            slot : str
+                Slot the argument must fill, e.g. '1' for the buyer of BUY. Needs template and argument
+        Returns:
+            _ : list of int
+                Sorted extraction ids
+        """
+        terms = []
+        if argument is not None and slot is not None:
+            terms.append('s\t{}\t{}\t{}'.format(template, slot, normalize(argument)))
+        else:
+            if template is not None:
+                terms.append('t\t' + template)
+            if argument is not None:
+                terms.append('a\t' + normalize(argument))
+        if not terms:
+            return list(range(len(self)))
+
+        # intersect starting from the shortest postings
+        postings = sorted((self.lookup(term) for term in terms), key=len)
+        ids = set(postings[0])
+        for other in postings[1:]:
+            ids.intersection_update(other)
+        return sorted(ids)
+
+    def close(self):
+        for mapped in (self._extractions, self._postings, self._terms):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for file in self._files:
+            file.close()
+
+def get_args():
+    #initialize argument parser
+    parser = argparse.ArgumentParser('Index the extractions of h-at and query them')
+    commands = parser.add_subparsers(dest='command')
+
+    # add arguments
+    build = commands.add_parser('build', help='Deduplicate the extractions of an output and write their index.')
+    build.add_argument('-i', '--input',
+                        metavar='<path>',
+                        default='output.jsonl',
+                        help='Output of main.py, the .jsonl file or the .json list.')
+    build.add_argument('-d', '--index',
+                        metavar='<path>',
+                        default='index',
+                        help='Directory of the index.')
+
+    query = commands.add_parser('query', help='Print the extractions matching a template and/or an argument, one JSON record per line.')
+    query.add_argument('-d', '--index',
+                        metavar='<path>',
+                        default='index',
+                        help='Directory of the index.')
+    query.add_argument('-t', '--template',
+                        metavar='<name>',
+                        default=None,
+                        help='Template of the extractions, e.g. BUY.')
+    query.add_argument('-a', '--argument',
+                        metavar='<text>',
+                        default=None,
+                        help='Argument of the extractions, e.g. Berkshire.')
+    query.add_argument('-s', '--slot',
+                        metavar='<name>',
+                        default=None,
+                        help='Slot the argument fills, e.g. 1 for the buyer of BUY. Needs --template and --argument.')
+    query.add_argument('--limit',
+                        metavar='<int>',
+                        type=int,
+                        default=None,
+                        help='Print at most this many extractions.')
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
+    if args.command == 'query' and args.slot is not None and (args.template is None or args.argument is None):
+        parser.error('--slot needs --template and --argument')
+    return args
+
+def main(args):
+    if args.command == 'build':
+        print("Indexing extractions of "+args.input)
+        count, total = build_index(_read_outputs(args.input), args.index)
+        print("Wrote {} extractions ({} before deduplication) to {}".format(count, total, args.index))
+        return
+
+    index = ExtractionIndex(args.index)
+    ids = index.query(template=args.template, argument=args.argument, slot=args.slot)
+    for id in ids[:args.limit]:
+        print(json.dumps(index.get(id)))
+    index.close()
+
+if __name__ == '__main__':
+    main(get_args())
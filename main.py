@@ -3,116 +3,136 @@ import sys
 import os
 import argparse
 import json
-from tqdm import tqdm
+import cProfile
+from collections import defaultdict, deque
 
-from nlp import NLP
+from corpus import open_corpus, parse_shard
+from engine import BatchEngine
+from features import TEMPLATES
+from nlp import PIPELINE_VERSION
+from profiler import get_profiler
+from parse_cache import ParseCache
+from storage import JsonlWriter, Checkpoint, content_hash, repair_jsonl, read_jsonl, latest_by_document, write_json_array, compact_jsonl
 
 class IE(object):
     """
     IE: Information Extraction class
     """
-    def __init__(self, **kwargs):
+    def __init__(self, batch_size=16, n_process=1, unit='article', templates=None, parse_cache=None, max_chars=100000, overlap_chars=2000, model=None, fork=None, coref=True, **kwargs):
         """
         Constructor
         Args:
+            batch_size : int
+                Number of articles parsed per nlp.pipe batch
+            n_process : int
+                Number of worker processes, 0 uses every core
+            unit : str
+                Unit of parallel parsing, 'article' or 'paragraph'
+            templates : list of str
+                Names of the templates to fill, defaults to every template
+            parse_cache : ParseCache
+                Cache of parsed articles, disabled if None
+            max_chars : int
+                Articles longer than this are parsed as bounded windows
+            overlap_chars : int
+                Context repeated at the start of each window
+            model : str
+                Directory of a pipeline snapshot written by snapshot.py, loaded instead of the "en" model
+            fork : bool
+                Fork the workers from this process once it has loaded the model, see BatchEngine
+            coref : bool
+                Resolve arguments through coreference where the templates ask for it
             kwargs : dict
         """
-        self._nlp = NLP()
+        # articles processed with another configuration are processed again by incremental runs
+        self.version = content_hash(json.dumps([PIPELINE_VERSION, templates or list(TEMPLATES), unit, max_chars, overlap_chars, model, coref]))
+        self.documents = []
+        self._engine = BatchEngine(batch_size=batch_size, n_process=n_process, unit=unit, fork=fork, templates=templates, parse_cache=parse_cache,
+                max_chars=max_chars, overlap_chars=overlap_chars, model=model, coref=coref)
 
-    def _nlp_extract(self, input, title):
+    def _read_wiki_data(self, wiki_path):
         """
-        Run NLP pipeline to extract NLP-based features
+        Read data, one article at a time
         Args:
-            input : str
-                Input data
-            title : str
-                Input tile
-                
+            wiki_path : str
+                Directory path containing Wikipedia articles as .txt files, or a dump file of JSON records
         Returns:
-            output : Tuples of (list of str, list of str, dict)
-                Tuple with 3 items: a list of sentences, a list of tokens, and a dict of features
+            corpus : WikiDir or DumpFile
+                corpus.articles() yields the (title, text) of the articles
         """
+        return open_corpus(wiki_path)
 
-        print('Extracting NLP features for article, {}'.format(title))
-        return self._nlp.extract(input)
-
-    def _read_wiki_data(self, wiki_file_dir):
-        """
-        Read data
-        Args:
-            wiki_file_dir : str
-                Directory path containing Wikipedia articles as .txt files.
-        Returns:
-            wiki_data : list of str
-                A list of the text corresponding (by list index) to the articles from the titles found in wiki_file_dir.
-            wiki_titles : list of str
-                A list of the article file names
-        """
-        wiki_titles = []
-        wiki_data = []
-        for file in os.listdir(wiki_file_dir):
-            if os.path.isfile(os.path.join(wiki_file_dir, file)):
-                wiki_titles.append(file)
-                with open(os.path.join(wiki_file_dir, file), encoding='latin-1') as wiki_file:
-                    wiki_data.append("".join(line.rstrip() for line in wiki_file))
-        print("Found Wikipedia Articles/Files: "+str(wiki_titles))
-        print("Done")
-        return wiki_data, wiki_titles
-
-    def _extract_template(self, sents, tokens, features, title):
-        """
-        Extract information following templates
-        Args:
-            sents : list
-                A list of sentences in an article
-            tokens : nested-list
-                A list of list of tokens per article
-            features : dict
-                Dictionary of features
-            title : str
-                Article titlle
-        Returns:
-            outputs : list
-                A list of all possible templates
-        """
-        print('Extracting templates for article, {}'.format(title))
-        return self._nlp.fill(title, sents, features)
-
-    def extract(self, wiki_file_dir):
+    def extract(self, wiki_path, checkpoint=None, shard=None, incremental=False):
         """
         Extract info from text doc
         Args:
-            wiki_file_dir : str
-                A single path to a directory with Wikipedia articles as .txt files.
+            wiki_path : str
+                A single path to a directory with Wikipedia articles as .txt files, or to a dump file of
+                JSON records {"title": ..., "text": ...}, one per line
+            checkpoint : Checkpoint
+                If given, articles already in the manifest are skipped and every yielded article is
+                recorded once the caller has consumed it
+            shard : (int, int)
+                If given as (i, N), only the articles whose title hashes to shard i of N are processed
+            incremental : bool
+                If True, article files whose modification time and size match the checkpoint are not even
+                read, and files touched without a change of content are recorded again without being processed
         Returns:
-            outputs : list
-                A list of templates per article
+            outputs : generator of dict
+                Templates per article, yielded as soon as each article is processed. Once it is consumed,
+                self.documents lists every article of the corpus (or shard), processed or not, in corpus order
         """
-        # read data
-        data, titles = self._read_wiki_data(wiki_file_dir)
-        print("Total Data: "+str(sum([len(d.encode('utf-8')) for d in data]))+" bytes")
+        corpus = self._read_wiki_data(wiki_path)
+        print("Found Wikipedia Articles/Files: "+str(len(corpus)))
+        print("Total Data: "+str(corpus.nbytes())+" bytes")
 
-        # extract NLP-based features and file templates
-        outputs = []
-        for text, title in zip(data, titles):
-            print("\nExtracting NLP Features:\n------------------------")
-            sents, tokens, features = self._nlp_extract(text, title)
+        # leave out the files unchanged since the checkpoint, the corpus leaves out the other shards
+        self.documents = []
+        stats = {}
+        def _skip(title, mtime, size):
+            self.documents.append(title)
+            if checkpoint is None:
+                return False
+            if incremental and checkpoint.unchanged(title, mtime, size):
+                return True
+            stats[title] = mtime, size
+            return False
 
-            print('\nEntities in document, {}\n'.format(title))
-            print(features['ents'])
+        # skip the articles of the manifest, remembering the hash of the ones in flight. A dump may repeat a
+        # title, whose records come back in order
+        hashes = defaultdict(deque)
+        def _pending(articles):
+            for title, text in articles:
+                hash = content_hash(text)
+                mtime, size = stats.pop(title)
+                if checkpoint.done(title, hash):
+                    if incremental:
+                        checkpoint.add(title, hash, mtime, size)    # touched, same content
+                    continue
+                hashes[title].append((hash, mtime, size))
+                yield title, text
 
-            #print('Dependency parsing in document, {}'.format(title))
-            #print(features['dep'])
+        articles = corpus.articles(skip=_skip, shard=shard)
+        if shard is not None:
+            print("Processing shard {}/{}".format(*shard))
+        if checkpoint is not None:
+            print("Skipping articles already processed: "+str(len(checkpoint)))
+            articles = _pending(articles)
 
-            print("\nExtracting templates:\n------------------------")
-            outputs.append(self._extract_template(sents, tokens, features, title))
+        # extract NLP-based features and fill templates, in batches
+        print("\nExtracting NLP Features and templates:\n------------------------")
+        try:
+            for output in self._engine.run(articles):
+                print('\nExtracted templated for document, {}'.format(output['document']))
+                print(output)
+                yield output
 
-            print('\nExtracted templated for document, {}'.format(title))
-            print(outputs[-1])
+                if checkpoint is not None:
+                    checkpoint.add(output['document'], *hashes[output['document']].popleft())
+        finally:
+            corpus.close()
 
         print("------------------------\nDone")
-    
-        return outputs
 
 class DefaultHelpParser(argparse.ArgumentParser):
     """
@@ -133,11 +153,94 @@ def get_args():
     required_args.add_argument('-w', '--wiki',
                         metavar='<path>',
                         required=True,
-                        help='Input path of directory to Wikipedia articles (.txt files) to read and analyze.')
+                        help='Input path of directory to Wikipedia articles (.txt files) to read and analyze, or of a dump file with one JSON record {"title", "text"} per line.')
+    parser.add_argument('-b', '--batch-size',
+                        metavar='<int>',
+                        type=int,
+                        default=16,
+                        help='Number of articles parsed per nlp.pipe batch.')
+    parser.add_argument('-n', '--workers',
+                        metavar='<int>',
+                        type=int,
+                        default=1,
+                        help='Number of worker processes, 0 uses every core.')
+    parser.add_argument('--model',
+                        metavar='<path>',
+                        default=None,
+                        help='Pipeline snapshot written by snapshot.py, loaded instead of building the pipeline from the "en" model.')
+    parser.add_argument('--no-fork',
+                        action='store_true',
+                        help='Let every worker load the model itself instead of forking the workers from the process holding the loaded model.')
+    parser.add_argument('--no-coref',
+                        action='store_true',
+                        help='Do not resolve pronoun arguments through coreference, which skips neuralcoref.')
+    parser.add_argument('--unit',
+                        choices=['article', 'paragraph'],
+                        default='article',
+                        help='Unit of parallel parsing: whole articles, or paragraphs merged back per article (coreference stays within a paragraph).')
+    parser.add_argument('-t', '--templates',
+                        metavar='<name>',
+                        nargs='+',
+                        choices=list(TEMPLATES),
+                        default=None,
+                        help='Templates to fill ({}). Defaults to all of them.'.format(', '.join(TEMPLATES)))
+    parser.add_argument('-o', '--output',
+                        metavar='<path>',
+                        default='output.json',
+                        help='Output JSON file, written once every article is processed.')
+    parser.add_argument('--jsonl',
+                        metavar='<path>',
+                        default=None,
+                        help='JSON Lines file receiving each article as soon as it is processed. Defaults to the output path with a .jsonl extension.')
+    parser.add_argument('--flush-every',
+                        metavar='<int>',
+                        type=int,
+                        default=10,
+                        help='Number of articles written between two flushes of the JSON Lines file.')
+    parser.add_argument('--max-chars',
+                        metavar='<int>',
+                        type=int,
+                        default=100000,
+                        help='Articles longer than this many characters are parsed as windows cut at paragraph or sentence boundaries.')
+    parser.add_argument('--overlap-chars',
+                        metavar='<int>',
+                        type=int,
+                        default=2000,
+                        help='Context repeated at the start of each window, linking coreference across windows.')
+    parser.add_argument('--parse-cache',
+                        metavar='<path>',
+                        default=None,
+                        help='Directory of the cache of parsed articles. The cache is disabled if not given.')
+    parser.add_argument('--parse-cache-size',
+                        metavar='<MB>',
+                        type=int,
+                        default=1024,
+                        help='Size bound of the parse cache in MB, least recently used entries are evicted first.')
+    parser.add_argument('--clear-parse-cache',
+                        action='store_true',
+                        help='Empty the parse cache before the run.')
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help='Record call counts and latencies of the pipeline stages and write a report next to the output.')
+    parser.add_argument('--profile-stats',
+                        metavar='<path>',
+                        default=None,
+                        help='Also run the main process under cProfile and dump the pstats to this file.')
+    parser.add_argument('--shard',
+                        metavar='<i/N>',
+                        type=parse_shard,
+                        default=None,
+                        help='Only process the articles whose title hashes to shard i of N. Outputs default to output.shard-i-of-N.*; combine them with merge.py.')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Skip the articles recorded in the checkpoint manifest of a previous run and keep appending to its JSON Lines file.')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='Only process the articles added or modified since the previous run with the same outputs and options, drop the deleted ones and update the outputs in place.')
     args = parser.parse_args()
 
     # validate input file
-    if not os.path.isdir(args.wiki):
+    if not os.path.exists(args.wiki):
         print("error: \""+args.wiki+"\" does not exist")
         quit()
 
@@ -145,14 +248,60 @@ def get_args():
 
 def main(args):
     print("\nH-AT: A Deep NLP Pipeline for Information Extraction\n====================================================")
-    print("Input Wikipedia File Directory: "+args.wiki)
-    my_ie = IE()
-    outputs = my_ie.extract(args.wiki)
+    print("Input Wikipedia File Directory/Dump: "+args.wiki)
+    profiler = get_profiler()
+    if args.profile:
+        profiler.enable()
+    cprofile = cProfile.Profile() if args.profile_stats else None
+    if cprofile is not None:
+        cprofile.enable()
+
+    parse_cache = None
+    if args.parse_cache:
+        parse_cache = ParseCache(args.parse_cache, max_bytes=args.parse_cache_size * 1024 * 1024)
+        if args.clear_parse_cache:
+            print("Clearing parse cache "+args.parse_cache)
+            parse_cache.clear()
+    if args.shard is not None and args.output == 'output.json':
+        args.output = 'output.shard-{}-of-{}.json'.format(*args.shard)
+
+    my_ie = IE(batch_size=args.batch_size, n_process=args.workers, unit=args.unit, templates=args.templates, parse_cache=parse_cache,
+            max_chars=args.max_chars, overlap_chars=args.overlap_chars, model=args.model, fork=False if args.no_fork else None,
+            coref=not args.no_coref)
+    jsonl = args.jsonl or os.path.splitext(args.output)[0] + '.jsonl'
+    manifest = os.path.splitext(jsonl)[0] + '.manifest.jsonl'
+    # the manifest is only trusted along with the records it lists
+    resume = (args.resume or args.incremental) and os.path.isfile(jsonl)
+    if resume:
+        repair_jsonl(jsonl)
+    checkpoint = Checkpoint(manifest, resume=resume, version=my_ie.version)
+
+    print("Writing results to "+jsonl)
+    with JsonlWriter(jsonl, flush_every=args.flush_every, append=resume, checkpoint=checkpoint) as writer:
+        for output in my_ie.extract(args.wiki, checkpoint=checkpoint, shard=args.shard, incremental=args.incremental):
+            writer.write(output)
     print("====================================================\nFinished")
 
-    print("Writing reults to output.json")
-    with open("output.json", "w") as file:
-        json.dump(outputs, file)
+    if args.incremental:
+        # keep the latest record of every current article, dropping the deleted ones
+        deleted = len(set(checkpoint.documents()) - set(my_ie.documents))
+        print("Dropping deleted articles: "+str(deleted))
+        compact_jsonl(manifest, my_ie.documents)
+        compact_jsonl(jsonl, my_ie.documents)
+
+    print("Writing reults to "+args.output)
+    write_json_array(latest_by_document(jsonl) if args.resume else read_jsonl(jsonl), args.output)
+
+    if cprofile is not None:
+        cprofile.disable()
+        cprofile.dump_stats(args.profile_stats)
+        print("Wrote cProfile stats to "+args.profile_stats)
+    if args.profile:
+        report = os.path.splitext(args.output)[0] + '.profile.json'
+        print("\nProfile:\n"+profiler.format())
+        with open(report, "w") as file:
+            json.dump(profiler.report(), file, indent=2)
+        print("Wrote profile report to "+report)
 
 if __name__ == '__main__':
     # get args
@@ -0,0 +1,27 @@
+# import dependencies
+import argparse
+
+from storage import merge_jsonl, write_json_array
+
+def get_args():
+    #initialize argument parser
+    parser = argparse.ArgumentParser('Merge the JSON Lines outputs of h-at shards (main.py --shard i/N) into one output.json')
+
+    # add arguments
+    parser.add_argument('jsonl',
+                        metavar='<path>',
+                        nargs='+',
+                        help='JSON Lines outputs of the shards, e.g. output.shard-*-of-N.jsonl')
+    parser.add_argument('-o', '--output',
+                        metavar='<path>',
+                        default='output.json',
+                        help='Merged output JSON file.')
+    return parser.parse_args()
+
+def main(args):
+    print("Merging {} shard outputs".format(len(args.jsonl)))
+    count = write_json_array(merge_jsonl(args.jsonl), args.output)
+    print("Wrote {} articles to {}".format(count, args.output))
+
+if __name__ == '__main__':
+    main(get_args())
@@ -1,325 +1,196 @@
 # import dependencies
 import os
-import spacy
-from nltk.corpus import wordnet
-from tqdm import tqdm
-import neuralcoref
 from collections import defaultdict
+from itertools import islice, chain
+
+from templates import TemplateEngine
+from features import TEMPLATES, resolve, components
+from feature_store import FeatureStore
+from parse_cache import COREF_KEY
+from profiler import TimedComponent, timed
+from synsets import LazyRelation, RELATIONS, get_cache
+from windows import split_windows
+
+# version of the extraction code, bump it when a change alters the templates filled for an article so
+# that incremental runs reprocess every article
+PIPELINE_VERSION = 5
 
 class NLP(object):
     """
     NLP pipeline
     """
-    def __init__(self):
+    def __init__(self, single_pass=True, templates=None, parse_cache=None, max_chars=100000, overlap_chars=2000, model=None, coref=True):
         """
         Constructor of NLP pipeline
+        Args:
+            single_pass : bool
+                If True, build features from the sentence spans of the parsed article instead of
+                re-parsing every sentence
+            templates : list of str
+                Names of the templates to fill, defaults to every registered template. Only the features
+                they declare are computed and unused spaCy components are disabled.
+            parse_cache : ParseCache
+                If given, parsed articles are stored in and loaded from this cache instead of being re-parsed
+            max_chars : int
+                Articles longer than this are parsed as windows of at most max_chars characters, cut at
+                paragraph or sentence boundaries, so memory stays bounded whatever the article size
+            overlap_chars : int
+                Context repeated at the start of each window, in characters, within which coreference
+                clusters are linked across windows
+            model : str
+                Directory of a pipeline snapshot written by NLP.save, loaded instead of the "en" model
+            coref : bool
+                If False, arguments are not resolved through coreference even if the templates ask for it,
+                and neuralcoref is not run
         """
-        self._nlp = spacy.load("en")
-        neuralcoref.add_to_pipe(self._nlp)
+        self._templates = list(TEMPLATES) if templates is None else list(templates)
+        self._features = resolve(self._templates)
+        if not coref:
+            self._features.discard('coref')
+        self._engine = TemplateEngine([TEMPLATES[name] for name in self._templates])
 
-        pass
-    def _get_features(self, input):
+        self._single_pass = single_pass
+        self._max_chars = max_chars
+        self._overlap_chars = overlap_chars
+        self._parse_cache = parse_cache
+        self._snapshot = model
+        # spaCy and neuralcoref are imported and the model loaded on first use, see load
+        self._pipeline = None
+        self._model = None
+
+    def load(self):
+        """
+        Load the spaCy model, unless already loaded
+        Called on first use of the pipeline, so constructing an NLP that processes no article stays cheap.
+        Returns:
+            self : NLP
+        """
+        if self._pipeline is not None:
+            return self
+        import spacy
+        needed = components(self._features)
+        if 'neuralcoref' in needed:
+            import neuralcoref    # also registers the factory restoring neuralcoref from a snapshot
+        nlp = spacy.load(self._snapshot or "en", disable=[name for name in ('tagger', 'parser', 'ner', 'neuralcoref') if name not in needed])
+        if 'neuralcoref' in needed and 'neuralcoref' not in nlp.pipe_names:
+            neuralcoref.add_to_pipe(nlp)
+        nlp.max_length = max(nlp.max_length, self._max_chars)
+
+        # time every pipeline component while the profiler is enabled
+        for name in nlp.pipe_names:
+            nlp.replace_pipe(name, TimedComponent(name, nlp.get_pipe(name)))
+
+        self._model = '{}_{}-{}'.format(nlp.meta['lang'], nlp.meta['name'], nlp.meta['version'])
+        self._pipeline = nlp
+        return self
+
+    def save(self, path):
+        """
+        Save the loaded pipeline, with only the components the templates need, as a snapshot that
+        NLP(model=path) loads directly
+        Args:
+            path : str
+                Directory of the snapshot
+        """
+        self._nlp.to_disk(path)    # TimedComponent hands to_disk to the wrapped component
+
+    @property
+    def _nlp(self):
+        return self.load()._pipeline
+
+    @timed('nlp.get_features')
+    def _get_features(self, input, features=None):
         """
         Get lemma, pos, tag, dependency
         Args: 
             input ; list of str
                 List of sentences
+            features : FeatureStore
+                Store to append to, a new one by default
         Returns:
-            _ : dict
-                Dictionary of
+            _ : FeatureStore
+                Features indexed by name then by sentence, e.g.
+                    'text' : list(list(str))
                     'lem' : list(list(str))
                     'pos' : list(list(str))
                     'tag': list(list(str))
                     'dep' : list(list(str))
         """
-        pos = []
-        tag = []
-        dep = []
-        dep_root = []
-        lem = []
-        ents = []
-        hypernyms, hyponyms, meronyms, holonyms = [], [], [], []
+        features = self._init_features() if features is None else features
+        from tqdm import tqdm
         for i in tqdm(range(len(input)), dynamic_ncols=True):
             sent = input[i]
             doc = self._nlp(sent)
+            features.add_sentence(doc, list(doc.sents)[0].root, doc.ents, 0)
+        return features
 
-            # add placeholder for each sentence
-            pos.append([])
-            tag.append([])
-            dep.append([])
-            dep_root.append(list(doc.sents)[0].root) # dep_root
-            lem.append([])
-            ents.append([(ent.text, ent.start_char, ent.end_char, ent.label_) for ent in doc.ents])
-            hypernyms.append([])
-            hyponyms.append([])
-            meronyms.append([])
-            holonyms.append([])
-
-            for tok in doc:
-                lem[-1].append(tok.lemma_)
-                pos[-1].append(tok.pos_) # pos
-                tag[-1].append(tok.tag_) # tag
-                dep[-1].append(tok.dep_) # dep
-
-                # wordnet features
-                hypernyms[-1].append(
-                        [x.hypernyms() for x in wordnet.synsets(tok.text)])
-                hyponyms[-1].append(
-                        [x.hyponyms() for x in wordnet.synsets(tok.text)])
-                meronyms[-1].append(
-                        [x.part_meronyms() for x in wordnet.synsets(tok.text)])
-                holonyms[-1].append(
-                        [x.part_holonyms() for x in wordnet.synsets(tok.text)])
-        return {'lem' : lem,
-                'pos' : pos, 
-                'tag' : tag, 
-                'dep' : dep, 
-                'dep_root' : dep_root,
-                'ents' : ents, 
-                'hypernyms' : hypernyms, 
-                'hyponyms' : hyponyms,
-                'meronyms' : meronyms, 
-                'holonyms' : holonyms}
-   
-    def fill_born(self, sents, features):
-        res = []
-        for i, lemmas, ents, dep, root in zip(range(len(sents)), features['lem'], features['ents'], features['dep'], features['dep_root']):
-            # in sentence
-            try:
-                # 1. Find index of the born verb in sentence
-                index = lemmas.index('bear')    # Born is the past participle of the verb bear
-                
-                # parse entities
-                def _parse_ents(inputs):
-                    """
-                    Parse entities into ORGs and DATEs
-                    """
-                    bornees, dates, locs = [], [], []
-                    for ent in inputs:
-                        if ent[-1] == 'DATE':
-                            dates.append(ent[0])
-                        elif ent[-1] == 'PERSON' or ent[-1] == 'ORG':
-                            bornees.append(ent[0])
-                        elif ent[-1] == 'LOC' or ent[-1] == 'GPE':  # LOC: Non-GPE locations, mountain ranges, bodies of water.; GPE: Countries, cities, states.
-                            locs.append(ent[0])
-                        
-                    return bornees, dates, locs
-                
-                def _find_token_i_in_parse_tree(root, search_i):
-                    """
-                    Recursive tree search for value search_i == attribute i of the nodes.
-                    """
-                    if root is None or root.i == search_i:
-                        return root
-                    else:
-                        for child in root.children:
-                            node = _find_token_i_in_parse_tree(child, search_i)
-                            if node is not None and node.i == search_i:
-                                return child
-                        return None
-                
-                # 2. Search for the parse tree node with i = index, the index of the 'bear' lemma previously found
-                born_token = _find_token_i_in_parse_tree(root, index)
-                
-                # 3. Analyze the parents and children of the born node to fill in the BORN template
-                bornee, loc, date = None, None, None
-                # 3a. Find the person or org being born
-                for child in born_token.children:
-                    #if child.dep_ == 'nsubjpass' or child.dep_ == 'nsubj':    # Found the thing being born
-                    if child.ent_type_ == 'PERSON' or child.ent_type_ == 'ORG':   # The thing is a PERSON or ORG
-                        bornee = child.text
-                        break
-                # 3b. Find their born date
-                if bornee is not None:  # Once a bornee is found, look for their born location and date
-                    for child in born_token.children:
-                        # Look for the preposition of the born location and date
-                        if child.dep_ == 'prep':
-                            for grandchild in child.children:
-                                if grandchild.ent_type_ == 'DATE' and date is None:
-                                    # Found the preposition date
-                                    date = grandchild.text
-                                if (grandchild.ent_type_ == 'LOC' or grandchild.ent_type_ == 'GPE') and date is None:
-                                    # Found the preposition location
-                                    loc = grandchild.text
-                                    
-                if bornee is not None:
-                    res.append({
-                        'template' : 'BORN',
-                        'sentences' : sents[i],
-                        'arguments' : {
-                            '1' : bornee,
-                            '2' : date, 
-                            '3' : loc}})
-                continue
-                
-                bornees, dates, locs = _parse_ents(ents)
+    @timed('nlp.get_features')
+    def _get_features_from_doc(self, doc, features=None, sents=None):
+        """
+        Get lemma, pos, tag, dependency from the sentence spans of an already parsed article
+        Args:
+            doc : spacy.tokens.Doc
+                Parsed article
+            features : FeatureStore
+                Store to append to, a new one by default
+            sents : list of spacy.tokens.Span
+                Sentences to add, defaults to every sentence of doc
+        Returns:
+            _ : FeatureStore
+                Same features as _get_features, with entity character offsets relative to each sentence
+        """
+        features = self._init_features() if features is None else features
+        from tqdm import tqdm
+        for sent in tqdm(doc.sents if sents is None else sents, dynamic_ncols=True):
+            features.add_sentence(sent, sent.root, sent.ents, sent.start_char)
+        return features
 
-                # get all possible ACQUIRE templates
-                if len(bornees) < 1:
-                    # find no entites
-                    continue
+    def _init_features(self):
+        """
+        Create an empty store of the features needed by the selected templates
+        WordNet relations are LazyRelation accessors over the token surface forms, computed only when read.
+        """
+        features = FeatureStore(self._features)
+        for relation in RELATIONS:
+            if relation in self._features:
+                features[relation] = LazyRelation(features['text'], relation)
+        return features
 
-                
-                # Get person/org born (assumption: they're the subject of the sentence)
-                if 'nsubj' in dep and lemmas[dep.index('nsubj')] in bornees:
-                    # active
-                    bornee = lemmas[dep.index('nsubj')]
-                elif 'nsubjpass' in dep and lemmas[dep.index('nsubjpass')] in bornees:
-                    # passive
-                    bornee = lemmas[dep.index('nsubjpass')]
-                else:
-                    continue
-                
-                # Get location, if any (assumption: it's the first prepositional object in the sentence)
-                if 'pobj' in dep and lemmas[dep.index('pobj')] in locs:
-                    loc = lemmas[dep.index('pobj')]
-                else:
-                    loc = 'None'
-                    
-                # Get date, if any (assumption: it's the first date in the sentence)
-                if len(dates) >= 1:
-                    date = dates[0]
-                else:
-                    date = 'None'
-                
-                res.append({
-                    'template' : 'BORN',
-                    'sentences' : sents[i],
-                    'arguments' : {
-                    '1' : bornee,
-                    '2' : loc, 
-                    '3' : date}})
-            except Exception as e:
-                #print(e)
-                pass
-        return res
-    
-    def fill_acquire(self, sents, features):
-        res = []
-        for i, lemmas, ents, dep in zip(range(len(sents)), features['lem'], features['ents'], features['dep']):
-
-            # in sentence
-            try:
-                # find index of acquire in lemmas
-                index = lemmas.index('acquire') or lemmas.index('buy')
-
-                # parse entities
-                def _parse_ents(inputs):
-                    """
-                    Parse entities into ORGs and DATEs
-                    """
-                    dates, orgs = [], []
-                    for ent in inputs:
-                        if ent[-1] == 'DATE':
-                            dates.append(ent[0])
-                        elif ent[-1] == 'ORG':
-                            orgs.append(ent[0])
-                    return dates, orgs
-
-                dates, orgs = _parse_ents(ents)
-
-                # get all possible ACQUIRE templates
-                if len(dates) < 1 or len(orgs) < 2:
-                    # find no entites
-                    continue
+    def _get_coref(self, doc):
+        """
+        Get the coreference clusters found by neuralcoref
+        Args:
+            doc : spacy.tokens.Doc
+                Parsed article
+        Returns:
+            _ : list(list(tuple(int, int)))
+                (start, end) token offsets of the mentions of each cluster, main mention first
+        """
+        if COREF_KEY in doc.user_data:
+            # restored from the parse cache
+            return doc.user_data[COREF_KEY]
 
-                # get buyer
-                if lemmas[dep.index('nsubj')] == orgs[0]:
-                    # active
-                    buyer = orgs.pop(0)
-                elif lemmas[dep.index('nsubjpass')] == orgs[0]:
-                    # passive
-                    buyer = orgs.pop()
-                else:
-                    buyer = 'None'
-                
-                # get sellers
-                temp = []
-                if len(dates) == 1:
-                    temp.append((buyer, orgs.pop(0), dates[-1]))
-                else:
-                    while dates and orgs:
-                        temp.append((buyer, orgs.pop(0), dates.pop(0)))
-
-                # add results
-                while temp:
-                    x = temp.pop()
-                    res.append({
-                        'template' : 'BUY',
-                        'sentences' : sents[i],
-                        'arguments' : {
-                            '1' : x[0],
-                            '2' : x[1],
-                            '3' : x[2]}})
-            except:
-                pass
-        return res
-    
-    def fill_part_of(self, sents, features):
-        res = []
-        for i, lemmas, ents, dep in zip(range(len(sents)), features['lem'], features['ents'], features['dep']):
-
-            # in sentence
-            try:
-                # find index of acquire in lemmas
-                index = lemmas.index('in') or lemmas.index('be') or lemmas.index('part')
-
-                # parse entities
-                def _parse_ents(inputs):
-                    """
-                    Parse entities into ORGs and PLACES
-                    """
-                    locs, orgs = [], []
-                    for ent in inputs:
-                        if ent[-1] == 'LOC' or ent[-1] == 'GPE':  # LOC: Non-GPE locations, mountain ranges, bodies of water.; GPE: Countries, cities, states.
-                            locs.append(ent[0])
-                        elif ent[-1] == 'ORG':
-                            orgs.append(ent[0])
-                    return locs, orgs
-
-                locs, orgs = _parse_ents(ents)
-                #print(lemmas)
-                #print(dep)
-                #print(ents)
-
-                # get all possible ACQUIRE templates
-                if len(locs) < 2 and len(orgs) < 2:
-                    # find no entites
-                    continue
+        clusters = []
+        for cluster in doc._.coref_clusters or []:
+            main = (cluster.main.start, cluster.main.end)
+            clusters.append([main] + [(m.start, m.end) for m in cluster.mentions if (m.start, m.end) != main])
+        return clusters
 
-                # get locations
-                if len(locs) >= 2:
-                    res.append({
-                        'template' : 'PART_OF',
-                        'sentences' : sents[i],
-                        'arguments' : {
-                            '1' : locs[0], 
-                            '2' : locs[1]
-                            }})
-                    continue
-                
-                # get organizations
-                if len(orgs) >= 1:
-                    res.append({
-                        'template' : 'PART_OF',
-                        'sentences' : setns[i],
-                        'arguments' : {
-                            '1' : orgs[0], 
-                            '2' : orgs[1]
-                        }})
-                    continue
-            except:
-                pass
-        return res
+    def wordnet_stats(self):
+        """
+        Hit and miss rates of the WordNet lookup cache of this process
+        """
+        return get_cache().stats()
 
+    @timed('nlp.fill')
     def fill(self, title, sents, features):
         """
         Fill templates of BORN, ACQUIRE, and PART_OF pert article
         Args:
             sents : list of str
                 A list of str per article
-            features : dict
-                Dictionary of features
+            features : FeatureStore
+                Features per sentence
         Returns:
             output : list
                 A list of filled templates
@@ -327,17 +198,12 @@ class NLP(object):
         templates = defaultdict(list)
         templates = {'document' : title,
                 'extractions' : []}
-        # BORN template
-        templates['extractions'].extend(self.fill_born(sents, features))
-            
-        # ACQUIRE template
-        templates['extractions'].extend(self.fill_acquire(sents, features))
-            
-        # PART-OF template
-        templates['extractions'].extend(self.fill_part_of(sents, features))
+        # BORN, ACQUIRE, and PART-OF templates, or the selected subset
+        templates['extractions'].extend(self._engine.fill(sents, features))
             
         return templates
 
+    @timed('nlp.extract')
     def extract(self, input):
         """
         Extract NLP features 
@@ -346,18 +212,188 @@ class NLP(object):
         Returns:
             sents: list(str)
             tokens: list(list(str))
-            features: dict
-                Dictionary of extracted lemmas, pos, tags, and dependencies
+            features: FeatureStore
+                Extracted lemmas, pos, tags, and dependencies per sentence
         """
-        input_doc = self._nlp(input)
+        article = self._new_article()
+        for start, body, end in split_windows(input, self._max_chars, self._overlap_chars):
+            self._add_window(article, self._parse(input[start:end]), body - start)
+        return self._finish_article(article)
+
+    def pipe(self, inputs, batch_size=16):
+        """
+        Extract NLP features for a stream of articles, parsing them in batches with nlp.pipe
+        Long articles are parsed as several windows, see split_windows.
+        Args:
+            inputs : iterable of (str, str)
+                Stream of (title, text) pairs
+            batch_size : int
+                Number of windows parsed per batch
+        Returns:
+            _ : generator of (str, list(str), list(list(str)), FeatureStore)
+                (title, sents, tokens, features) per article, in input order
+        """
+        def _windows():
+            for title, text in inputs:
+                windows = split_windows(text, self._max_chars, self._overlap_chars)
+                for k, (start, body, end) in enumerate(windows):
+                    yield text[start:end], (title, k == len(windows) - 1, body - start)
+
+        windows = _windows()
+        first = next(windows, None)
+        if first is None:
+            return    # no input, the model is not loaded
+        windows = chain([first], windows)
+        if self._parse_cache is None:
+            docs = self._nlp.pipe(windows, as_tuples=True, batch_size=batch_size)
+        else:
+            docs = self._pipe_cached(windows, batch_size)
+
+        # windows of an article come in order, its features are built as they arrive
+        article = None
+        for doc, (title, last, body) in docs:
+            if article is None:
+                article = self._new_article()
+            self._add_window(article, doc, body)
+            if last:
+                sents, tokens, features = self._finish_article(article)
+                article = None
+                yield title, sents, tokens, features
+
+    def _cache_key(self, text):
+        pipe_names = self._nlp.pipe_names
+        return self._parse_cache.key(text, self._model, pipe_names)
+
+    @timed('nlp.parse')
+    def _parse(self, text):
+        """
+        Parse an article, going through the parse cache if any
+        """
+        if self._parse_cache is None:
+            return self._nlp(text)
+
+        key = self._cache_key(text)
+        doc = self._parse_cache.get(key, self._nlp.vocab)
+        if doc is None:
+            doc = self._nlp(text)
+            self._parse_cache.put(key, doc, self._get_coref(doc) if 'neuralcoref' in self._nlp.pipe_names else None)
+        return doc
+
+    def _pipe_cached(self, inputs, batch_size):
+        """
+        Parse a stream of texts, loading cached Docs and sending only the misses through nlp.pipe
+        Args:
+            inputs : iterable of (str, object)
+                Stream of (text, context) pairs, as for nlp.pipe(as_tuples=True)
+        Returns:
+            _ : generator of (spacy.tokens.Doc, object)
+                (doc, context) per text, in input order
+        """
+        inputs = iter(inputs)
+        coref = 'neuralcoref' in self._nlp.pipe_names
+        while True:
+            batch = list(islice(inputs, batch_size))
+            if not batch:
+                return
+
+            keys = [self._cache_key(text) for text, context in batch]
+            docs = [self._parse_cache.get(key, self._nlp.vocab) for key in keys]
+            misses = [(text, i) for i, (text, context) in enumerate(batch) if docs[i] is None]
+            for doc, i in self._nlp.pipe(misses, as_tuples=True, batch_size=batch_size):
+                self._parse_cache.put(keys[i], doc, self._get_coref(doc) if coref else None)
+                docs[i] = doc
+
+            for doc, (text, context) in zip(docs, batch):
+                yield doc, context
+
+    @timed('nlp.extract_doc')
+    def _extract_doc(self, input_doc):
+        """
+        Extract NLP features from a parsed article
+        Args:
+            input_doc : spacy.tokens.Doc
+        Returns:
+            Same as extract
+        """
+        article = self._new_article()
+        self._add_window(article, input_doc, 0)
+        return self._finish_article(article)
+
+    def _new_article(self):
+        """
+        Empty article, filled window by window by _add_window
+        """
+        return {'sents' : [],
+                'tokens' : [],
+                'features' : self._init_features(),
+                'coref' : [],
+                'mentions' : {}}    # mention -> index of its cluster in 'coref'
+
+    @timed('nlp.add_window')
+    def _add_window(self, article, doc, body):
+        """
+        Append the sentences of a parsed window to an article
+        Args:
+            article : dict
+                Article from _new_article
+            doc : spacy.tokens.Doc
+                Parsed window
+            body : int
+                Character offset in the window where its own text starts. Sentences ending before it belong
+                to the context, already added with the previous window, and a sentence crossing it is trimmed
+                to its tokens after it
+        """
+        sents = []
+        for sent in doc.sents:
+            if sent.end_char <= body:
+                continue
+            if sent.start_char < body:
+                # spaCy did not break at the cut, the start of the sentence ends the previous window
+                first = next((token.i for token in sent if token.idx >= body), sent.end)
+                if first == sent.end:
+                    continue
+                sent = doc[first:sent.end]
+            sents.append(sent)
+        # index in the article of the first token of the window
+        offset = len(article['tokens']) - (sents[0].start if sents else len(doc))
 
         # to sentences
-        sents = [sent.text for sent in input_doc.sents]
+        article['sents'].extend(sent.text.strip() for sent in sents)   # drop the paragraph breaks
 
         # to tokens
-        tokens = [token.text for token in input_doc]
+        for sent in sents:
+            article['tokens'].extend(token.text for token in sent)
 
         # get pos, tags, lemmas, and dependency
-        features = self._get_features(sents)
+        if self._single_pass:
+            self._get_features_from_doc(doc, article['features'], sents)
+        else:
+            self._get_features([sent.text for sent in sents], article['features'])
+
+        # coreference clusters, merged with the clusters of the previous window sharing a mention
+        if 'coref' in self._features:
+            for cluster in self._get_coref(doc):
+                cluster = [(start + offset, end + offset) for start, end in cluster if start + offset >= 0]
+                known = [article['mentions'][m] for m in cluster if m in article['mentions']]
+                if known:
+                    merged = article['coref'][known[0]]
+                    merged.extend(m for m in cluster if m not in article['mentions'])
+                else:
+                    known = [len(article['coref'])]
+                    article['coref'].append(cluster)
+                for mention in cluster:
+                    article['mentions'].setdefault(mention, known[0])
+
+    def _finish_article(self, article):
+        """
+        Sentences, tokens and features of an article built by _add_window
+        Returns:
+            Same as extract
+        """
+        features = article['features']
+
+        # document-level coreference clusters
+        if 'coref' in self._features:
+            features.set_coref([cluster for cluster in article['coref'] if cluster])
 
-        return sents, tokens, features
+        return article['sents'], article['tokens'], features
@@ -0,0 +1,162 @@
+# import dependencies
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+from profiler import timed
+
+# token attributes stored for each cached Doc. SENT_START is left out: spaCy rebuilds the
+# sentence boundaries from HEAD and refuses both at once
+ATTRS = ['ORTH', 'LEMMA', 'TAG', 'POS', 'HEAD', 'DEP', 'ENT_IOB', 'ENT_TYPE']
+
+# Doc.user_data key holding the compact coreference clusters of a cached Doc
+COREF_KEY = 'h-at.coref'
+
+class ParseCache(object):
+    """
+    ParseCache: content-addressed on-disk cache of parsed spaCy Docs
+    Entries are keyed by hash(text, model name, pipeline config) and evicted least recently used
+    first once the cache grows over its size bound.
+    """
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        """
+        Constructor
+        Args:
+            cache_dir : str
+                Directory of the cache, created if missing
+            max_bytes : int
+                Size bound of the cache on disk
+        """
+        self._dir = cache_dir
+        self._max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    def _entries(self):
+        """
+        Paths of the cached entries
+        """
+        for root, dirs, files in os.walk(self._dir):
+            for file in files:
+                if file.endswith('.bin'):
+                    yield os.path.join(root, file)
+
+    def _path(self, key):
+        return os.path.join(self._dir, key[:2], key + '.bin')
+
+    def key(self, text, model, config):
+        """
+        Key of an article parsed by a given pipeline
+        Args:
+            text : str
+            model : str
+                Model name and version
+            config : list of str
+                Names of the pipeline components
+        Returns:
+            _ : str
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([model, list(config)]).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    @timed('parse_cache.get')
+    def get(self, key, vocab):
+        """
+        Load a cached Doc
+        Args:
+            key : str
+            vocab : spacy.vocab.Vocab
+                Vocab of the pipeline the Doc is restored into
+        Returns:
+            doc : spacy.tokens.Doc
+                None on a miss. The coreference clusters, if any, are in doc.user_data[COREF_KEY]
+        """
+        import srsly
+        from spacy.tokens import DocBin
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                entry = srsly.msgpack_loads(file.read())
+            doc = list(DocBin(attrs=ATTRS).from_bytes(entry['doc']).get_docs(vocab))[0]
+            coref = entry['coref']
+        except Exception:
+            # missing entry (OSError) or corrupt one, e.g. truncated, on which msgpack, zlib and DocBin raise
+            # all sorts of errors
+            self.misses += 1
+            return None
+        os.utime(path)    # mark as recently used
+        self.hits += 1
+
+        if coref is not None:
+            doc.user_data[COREF_KEY] = [[tuple(mention) for mention in cluster] for cluster in coref]
+        return doc
+
+    @timed('parse_cache.put')
+    def put(self, key, doc, coref=None):
+        """
+        Store a parsed Doc
+        Args:
+            key : str
+            doc : spacy.tokens.Doc
+            coref : list(list(tuple(int, int)))
+                Compact coreference clusters of the Doc, see NLP._get_coref
+        """
+        import srsly
+        from spacy.tokens import DocBin
+        doc_bin = DocBin(attrs=ATTRS)
+        doc_bin.add(doc)
+        data = srsly.msgpack_dumps({'doc' : doc_bin.to_bytes(), 'coref' : coref})
+
+        # write to a temporary file first, workers may share the cache
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        try:
+            replaced = os.path.getsize(path)    # entry of the same key, e.g. written by another worker
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+
+        self._size += len(data) - replaced
+        if self._size > self._max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache is back under 90% of its bound
+        """
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= 0.9 * self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._size -= size
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        shutil.rmtree(self._dir, ignore_errors=True)
+        os.makedirs(self._dir, exist_ok=True)
+        self._size = 0
@@ -0,0 +1,187 @@
+# import dependencies
+import time
+from functools import wraps
+
+class Stat(object):
+    """
+    Stat: call count, cumulative time and log2 latency histogram of an instrumented call
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}   # bucket b holds latencies in [2^(b-1), 2^b) microseconds
+
+    def add(self, elapsed, n=1):
+        """
+        Record a call
+        Args:
+            elapsed : float
+                Latency in seconds
+            n : int
+                Number of items processed by the call, e.g. documents of a batch
+        """
+        self.count += n
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        bucket = int(elapsed * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for bucket, n in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + n
+
+    def percentile(self, q):
+        """
+        Upper bound of the latency bucket holding the q-th quantile, in seconds
+        """
+        calls = sum(self.buckets.values())
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= q * calls:
+                return (1 << bucket) / 1e6
+        return 0.0
+
+    def to_dict(self):
+        return {'count' : self.count,
+                'total_s' : self.total,
+                'mean_ms' : 1000 * self.total / self.count if self.count else 0.0,
+                'p50_ms' : 1000 * min(self.max, self.percentile(0.5)),
+                'p95_ms' : 1000 * min(self.max, self.percentile(0.95)),
+                'max_ms' : 1000 * self.max,
+                'histogram_us' : {str(1 << bucket) : n for bucket, n in sorted(self.buckets.items())}}
+
+class Profiler(object):
+    """
+    Profiler: records instrumented calls while enabled
+    When disabled, an instrumented call costs one attribute check.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.stats = {}
+
+    def add(self, name, elapsed, n=1):
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = Stat()
+        stat.add(elapsed, n)
+
+    def call(self, name, fn, *args, **kwargs):
+        """
+        Call fn, recording its latency under name
+        """
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Take the recorded stats and reset them, e.g. to send them from a worker process
+        """
+        stats, self.stats = self.stats, {}
+        return stats
+
+    def merge(self, stats):
+        """
+        Add stats recorded elsewhere, e.g. in a worker process
+        """
+        for name, other in stats.items():
+            if name not in self.stats:
+                self.stats[name] = Stat()
+            self.stats[name].merge(other)
+
+    def report(self):
+        """
+        Stats of every instrumented call, slowest cumulative time first
+        Returns:
+            _ : dict
+        """
+        names = sorted(self.stats, key=lambda name: -self.stats[name].total)
+        return {name : self.stats[name].to_dict() for name in names}
+
+    def format(self):
+        """
+        Report as a text table
+        """
+        lines = ['{:<32} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('call', 'count', 'total s', 'mean ms', 'p95 ms', 'max ms')]
+        for name, stat in self.report().items():
+            lines.append('{:<32} {:>10} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                name, stat['count'], stat['total_s'], stat['mean_ms'], stat['p95_ms'], stat['max_ms']))
+        return '\n'.join(lines)
+
+# profiler shared by every instrumented call of the process, disabled by default
+_profiler = Profiler()
+
+def get_profiler():
+    """
+    Return the process-wide Profiler
+    """
+    return _profiler
+
+def timed(name):
+    """
+    Decorator recording the calls of a function under name while the profiler is enabled
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _profiler.enabled:
+                return fn(*args, **kwargs)
+            return _profiler.call(name, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+class TimedComponent(object):
+    """
+    TimedComponent: spaCy pipeline component recording its latency while the profiler is enabled
+    Batches going through nlp.pipe are timed as a whole and counted once per document.
+    """
+    def __init__(self, name, component):
+        self.name = 'spacy.' + name
+        self.component = component
+
+    def __call__(self, doc):
+        if not _profiler.enabled:
+            return self.component(doc)
+        return _profiler.call(self.name, self.component, doc)
+
+    def pipe(self, docs, batch_size=128, **kwargs):
+        if not _profiler.enabled:
+            if hasattr(self.component, 'pipe'):
+                yield from self.component.pipe(docs, batch_size=batch_size, **kwargs)
+            else:
+                yield from (self.component(doc) for doc in docs)
+            return
+
+        # pull each batch from the previous components first, so only this component is timed
+        docs = iter(docs)
+        while True:
+            batch = [doc for _, doc in zip(range(batch_size), docs)]
+            if not batch:
+                return
+            start = time.perf_counter()
+            if hasattr(self.component, 'pipe'):
+                batch = list(self.component.pipe(batch, batch_size=batch_size, **kwargs))
+            else:
+                batch = [self.component(doc) for doc in batch]
+            _profiler.add(self.name, time.perf_counter() - start, len(batch))
+            yield from batch
+
+    def __getattr__(self, name):
+        # expose the attributes of the wrapped component, e.g. its vocab or cfg
+        return getattr(self.component, name)
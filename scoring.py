@@ -0,0 +1,138 @@
+# import dependencies
+
+# weights of the features of a (trigger, entity) pair in the score of the entity as an argument,
+# the highest scoring candidate of a slot is chosen
+WEIGHTS = {'tree' : -1.0,    # dependency tree distance from the trigger to the root token of the entity
+        'linear' : -0.1,    # tokens between the trigger and the entity
+        'dep' : 1.5,    # root token of the entity is an argument of its head, or has a label required by the slot
+        'type' : 0.5}    # entity has the first, preferred type of the slot
+
+# dependency labels of the tokens that are arguments of their head rather than modifiers
+ARGUMENT_DEPS = ('nsubj', 'nsubjpass', 'dobj', 'pobj', 'attr', 'appos', 'conj')
+
+def _depths(heads):
+    """
+    Depth of every token in its dependency tree, climbing all the tokens at once
+    """
+    import numpy as np
+    depth = np.zeros(len(heads), dtype=np.int64)
+    node = np.arange(len(heads))
+    for _ in range(len(heads)):
+        up = heads[node] != node
+        if not up.any():
+            break
+        depth += up
+        node = heads[node]
+    return depth
+
+def _tree_distances(heads, depth, a, b):
+    """
+    Tree distances between the tokens a[p] and b[p] of every pair p, in the same tree
+    The deeper token of every pair climbs one step at a time, both when at the same depth, until they meet.
+    """
+    import numpy as np
+    a, b = a.copy(), b.copy()
+    da, db = depth[a], depth[b]
+    dist = np.zeros(len(a), dtype=np.int64)
+    for _ in range(int(depth.max(initial=0)) + 1):
+        diff = a != b
+        if not diff.any():
+            break
+        up_a = diff & (da >= db)
+        up_b = diff & (db >= da)
+        a[up_a] = heads[a[up_a]]
+        b[up_b] = heads[b[up_b]]
+        da = da - up_a
+        db = db - up_b
+        dist += up_a
+        dist += up_b
+    return dist
+
+def pair_features(features, tasks):
+    """
+    Features of every (trigger, entity) pair of a batch of sentences, computed with vectorized operations
+    over all the pairs of the batch
+    Args:
+        features : FeatureStore
+            Needs the 'head', 'dep' and 'ents' features
+        tasks : list of (int, int)
+            (sentence, trigger token index) pairs
+    Returns:
+        _ : dict
+            (sentence, trigger) -> (tree, linear, deps, labels, distances), arrays over the entities of
+            the sentence, distances being the matrix of the tree distances between its entities
+    """
+    import numpy as np
+    sents = sorted(set(i for i, index in tasks))
+    heads, bases, deps, spans, labels = [], {}, {}, {}, {}
+    base = 0
+    for i in sents:
+        sent_heads = features['head'][i]
+        bases[i] = base
+        heads.append(np.asarray(sent_heads, dtype=np.int64) + base)
+        deps[i] = np.asarray(features['dep'][i], dtype=object)
+        ents = features['ents'][i]
+        spans[i] = np.asarray([features.entity_span(i, k) for k in range(len(ents))], dtype=np.int64).reshape(-1, 2)
+        labels[i] = np.asarray([ent[-1] for ent in ents], dtype=object)
+        base += len(sent_heads)
+    heads = np.concatenate(heads) if heads else np.zeros(0, dtype=np.int64)
+    depth = _depths(heads)
+
+    # root token of every entity: its shallowest token, the leftmost on ties
+    starts = np.concatenate([spans[i][:, 0] + bases[i] for i in sents]) if sents else np.zeros(0, dtype=np.int64)
+    ends = np.concatenate([spans[i][:, 1] + bases[i] for i in sents]) if sents else np.zeros(0, dtype=np.int64)
+    roots = np.zeros(0, dtype=np.int64)
+    if len(starts):
+        lengths = ends - starts
+        bounds = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        tokens = np.arange(lengths.sum()) - np.repeat(bounds - starts, lengths)
+        roots = np.minimum.reduceat(depth[tokens] * len(heads) + tokens, bounds) % len(heads)
+    first = {}
+    n = 0
+    for i in sents:
+        first[i] = n
+        n += len(spans[i])
+
+    # every (trigger, entity) pair of the batch
+    counts = [len(spans[i]) for i, index in tasks]
+    triggers = np.repeat(np.asarray([bases[i] + index for i, index in tasks], dtype=np.int64), counts)
+    ents = np.concatenate([np.arange(len(spans[i])) + first[i] for i, index in tasks]) if tasks else np.zeros(0, dtype=np.int64)
+    tree = _tree_distances(heads, depth, triggers, roots[ents]) if len(ents) else np.zeros(0, dtype=np.int64)
+    linear = np.maximum(0, np.maximum(starts[ents] - triggers, triggers - ends[ents] + 1)) if len(ents) else np.zeros(0, dtype=np.int64)
+
+    # every (entity, entity) pair of each sentence, e.g. to pair the acquired orgs with their dates
+    sizes = [len(spans[i]) for i in sents]
+    left = np.concatenate([np.repeat(np.arange(m), m) + first[i] for i, m in zip(sents, sizes)]) if sents else np.zeros(0, dtype=np.int64)
+    right = np.concatenate([np.tile(np.arange(m), m) + first[i] for i, m in zip(sents, sizes)]) if sents else np.zeros(0, dtype=np.int64)
+    between = _tree_distances(heads, depth, roots[left], roots[right]) if len(left) else np.zeros(0, dtype=np.int64)
+    distances = {}
+    pos = 0
+    for i, m in zip(sents, sizes):
+        distances[i] = between[pos:pos + m * m].reshape(m, m)
+        pos += m * m
+
+    res = {}
+    pos = 0
+    for (i, index), count in zip(tasks, counts):
+        pair = slice(pos, pos + count)
+        root_deps = deps[i][roots[ents[pair]] - bases[i]] if count else np.zeros(0, dtype=object)
+        res[(i, index)] = (tree[pair], linear[pair], root_deps, labels[i], distances[i])
+        pos += count
+    return res
+
+def slot_scores(slot, tree, linear, deps, labels):
+    """
+    Scores of the entities of a sentence as the argument of a slot
+    Args:
+        slot : Slot
+        tree, linear, deps, labels : numpy.ndarray
+            Pair features of the entities, see pair_features
+    Returns:
+        _ : numpy.ndarray
+            One score per entity, higher is better
+    """
+    import numpy as np
+    score = WEIGHTS['tree'] * tree + WEIGHTS['linear'] * linear
+    score = score + WEIGHTS['dep'] * np.isin(deps, ARGUMENT_DEPS + (slot.dep or ()))
+    score = score + WEIGHTS['type'] * (labels == slot.types[0])
+    return score
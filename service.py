@@ -0,0 +1,330 @@
+# import dependencies
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import BatchEngine
+from features import TEMPLATES
+from parse_cache import ParseCache
+
+# reason phrases of the status codes sent by the service
+_STATUS = {200 : 'OK', 400 : 'Bad Request', 404 : 'Not Found', 405 : 'Method Not Allowed',
+        413 : 'Payload Too Large', 500 : 'Internal Server Error'}
+
+class _BodyTooLarge(ValueError):
+    """
+    Request body over the size accepted by the server, answered with 413
+    """
+
+class ExtractionService(object):
+    """
+    ExtractionService: long-lived extractor loading the NLP pipeline once, micro-batching
+    concurrent requests into nlp.pipe calls
+    """
+    def __init__(self, batch_size=16, max_latency=0.05, unit='article', **nlp_kwargs):
+        """
+        Constructor
+        Args:
+            batch_size : int
+                Maximum number of articles parsed per nlp.pipe batch
+            max_latency : float
+                Seconds a request may wait for other requests to join its batch
+            unit : str
+                Unit of parsing, 'article' or 'paragraph', see BatchEngine
+            nlp_kwargs : dict
+                Arguments of the NLP pipeline (templates, parse_cache, max_chars, ...)
+        """
+        self._batch_size = max(1, batch_size)
+        self._max_latency = max_latency
+        # loaded now, so the first request does not wait for the model
+        self._engine = BatchEngine(batch_size=self._batch_size, n_process=1, unit=unit, **nlp_kwargs).load()
+        # spaCy is not shared between threads, batches are parsed one at a time off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+        self._batcher = None
+        self.batches = 0
+        self.articles = 0
+
+    async def start(self):
+        """
+        Start collecting requests, must be called from the event loop
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Stop the batcher, requests still queued are cancelled
+        """
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            self._queue.get_nowait()[2].cancel()
+        self._executor.shutdown()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    async def extract(self, title, text):
+        """
+        Fill the templates of an article
+        Args:
+            title : str
+                Document name reported in the output
+            text : str
+                Article text
+        Returns:
+            output : dict
+                Same as NLP.fill
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((title, text, future))
+        return await future
+
+    async def _run(self):
+        """
+        Take the queued requests as batches of at most batch_size, waiting at most max_latency after the
+        first request of a batch for others to join
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_latency
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [request for request in batch if not request[2].cancelled()]
+            if not batch:
+                continue
+            try:
+                outputs = await loop.run_in_executor(self._executor, self._fill_batch, [(title, text) for title, text, future in batch])
+            except Exception as error:
+                for title, text, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (title, text, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def _fill_batch(self, articles):
+        """
+        Parse a batch of articles and fill their templates, in the executor thread
+        """
+        outputs = list(self._engine.run(articles))
+        self.batches += 1
+        self.articles += len(articles)
+        return outputs
+
+class HTTPServer(object):
+    """
+    HTTPServer: minimal asyncio HTTP/1.1 front end of an ExtractionService
+        POST /extract   body {"title": ..., "text": ...} or plain text, returns the NLP.fill JSON
+        GET /health     returns the pending requests and batch counts
+    """
+    def __init__(self, service, max_body=10 * 1024 * 1024):
+        """
+        Constructor
+        Args:
+            service : ExtractionService
+            max_body : int
+                Largest request body accepted, in bytes
+        """
+        self._service = service
+        self._max_body = max_body
+        self._requests = 0
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of a connection, kept alive unless the client asks otherwise
+        """
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except _BodyTooLarge as error:
+            self._write_response(writer, 413, {'error' : str(error)}, False)
+        except ValueError as error:
+            self._write_response(writer, 400, {'error' : str(error)}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """
+        Read a request line, its headers and body
+        Returns:
+            _ : (str, str, dict, bytes), or None once the client closed the connection
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode('latin-1').split()
+        except ValueError:
+            raise ValueError('malformed request line')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if length > self._max_body:
+            raise _BodyTooLarge('request body larger than {} bytes'.format(self._max_body))
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    async def _route(self, method, path, headers, body):
+        """
+        Dispatch a request
+        Returns:
+            status : int
+            payload : dict
+        """
+        path = path.split('?')[0]
+        if path == '/health':
+            return 200, {'status' : 'ok',
+                    'pending' : self._service.pending(),
+                    'batches' : self._service.batches,
+                    'articles' : self._service.articles}
+        if path != '/extract':
+            return 404, {'error' : 'unknown path ' + path}
+        if method != 'POST':
+            return 405, {'error' : 'use POST'}
+
+        self._requests += 1
+        try:
+            if headers.get('content-type', '').startswith('application/json'):
+                request = json.loads(body.decode('utf-8'))
+                title, text = request.get('title', 'request-{}'.format(self._requests)), request['text']
+            else:
+                title, text = 'request-{}'.format(self._requests), body.decode('utf-8')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return 400, {'error' : 'expected plain text or a JSON object {"title": ..., "text": ...}'}
+
+        try:
+            return 200, await self._service.extract(title, text)
+        except Exception as error:
+            return 500, {'error' : str(error)}
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        head = ['HTTP/1.1 {} {}'.format(status, _STATUS[status]),
+                'Content-Type: application/json',
+                'Content-Length: {}'.format(len(body)),
+                'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+def get_args():
+    #initialize argument parser
+    parser = argparse.ArgumentParser('Serve h-at over HTTP: POST /extract with an article, get its templates back')
+
+    # add arguments
+    parser.add_argument('--host',
+                        metavar='<host>',
+                        default='127.0.0.1',
+                        help='Address to listen on.')
+    parser.add_argument('-p', '--port',
+                        metavar='<int>',
+                        type=int,
+                        default=8080,
+                        help='Port to listen on.')
+    parser.add_argument('-b', '--batch-size',
+                        metavar='<int>',
+                        type=int,
+                        default=16,
+                        help='Maximum number of requests parsed per nlp.pipe batch.')
+    parser.add_argument('--max-latency-ms',
+                        metavar='<ms>',
+                        type=float,
+                        default=50,
+                        help='Time a request may wait for other requests to join its batch.')
+    parser.add_argument('--model',
+                        metavar='<path>',
+                        default=None,
+                        help='Pipeline snapshot written by snapshot.py, loaded instead of building the pipeline from the "en" model.')
+    parser.add_argument('--no-coref',
+                        action='store_true',
+                        help='Do not resolve pronoun arguments through coreference, which skips neuralcoref.')
+    parser.add_argument('--unit',
+                        choices=['article', 'paragraph'],
+                        default='article',
+                        help='Unit of parsing: whole articles, or paragraphs merged back per article.')
+    parser.add_argument('-t', '--templates',
+                        metavar='<name>',
+                        nargs='+',
+                        choices=list(TEMPLATES),
+                        default=None,
+                        help='Templates to fill. Defaults to all of them.')
+    parser.add_argument('--max-chars',
+                        metavar='<int>',
+                        type=int,
+                        default=100000,
+                        help='Articles longer than this many characters are parsed as windows.')
+    parser.add_argument('--overlap-chars',
+                        metavar='<int>',
+                        type=int,
+                        default=2000,
+                        help='Context repeated at the start of each window.')
+    parser.add_argument('--parse-cache',
+                        metavar='<path>',
+                        default=None,
+                        help='Directory of the cache of parsed articles. The cache is disabled if not given.')
+    parser.add_argument('--parse-cache-size',
+                        metavar='<MB>',
+                        type=int,
+                        default=1024,
+                        help='Size bound of the parse cache in MB.')
+    return parser.parse_args()
+
+def main(args):
+    print("\nH-AT: A Deep NLP Pipeline for Information Extraction\n====================================================")
+    print("Loading NLP pipeline")
+    parse_cache = None
+    if args.parse_cache:
+        parse_cache = ParseCache(args.parse_cache, max_bytes=args.parse_cache_size * 1024 * 1024)
+    service = ExtractionService(batch_size=args.batch_size, max_latency=args.max_latency_ms / 1000, unit=args.unit,
+            templates=args.templates, parse_cache=parse_cache, max_chars=args.max_chars, overlap_chars=args.overlap_chars, model=args.model,
+            coref=not args.no_coref)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(service.start())
+    server = loop.run_until_complete(asyncio.start_server(HTTPServer(service).handle, args.host, args.port))
+    print("Serving on http://{}:{}/extract".format(args.host, args.port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.run_until_complete(service.stop())
+        loop.close()
+    print("====================================================\nStopped")
+
+if __name__ == '__main__':
+    main(get_args())
@@ -0,0 +1,34 @@
+# import dependencies
+import argparse
+
+from features import TEMPLATES
+from nlp import NLP
+
+def get_args():
+    #initialize argument parser
+    parser = argparse.ArgumentParser('Save the h-at pipeline of the selected templates as a snapshot, loaded with main.py --model')
+
+    # add arguments
+    parser.add_argument('-o', '--output',
+                        metavar='<path>',
+                        required=True,
+                        help='Directory of the snapshot.')
+    parser.add_argument('-t', '--templates',
+                        metavar='<name>',
+                        nargs='+',
+                        choices=list(TEMPLATES),
+                        default=None,
+                        help='Templates the pipeline is built for, only the components they need are saved. Defaults to all of them.')
+    parser.add_argument('--no-coref',
+                        action='store_true',
+                        help='Leave neuralcoref out of the snapshot, for runs with --no-coref.')
+    return parser.parse_args()
+
+def main(args):
+    print("Loading NLP pipeline")
+    nlp = NLP(templates=args.templates, coref=not args.no_coref).load()
+    nlp.save(args.output)
+    print("Wrote pipeline snapshot to "+args.output)
+
+if __name__ == '__main__':
+    main(get_args())
@@ -0,0 +1,255 @@
+# import dependencies
+import os
+import json
+import hashlib
+import heapq
+
+from profiler import timed
+
+class JsonlWriter(object):
+    """
+    JsonlWriter: writes one JSON record per line as soon as it is ready, flushing periodically
+    """
+    def __init__(self, path, flush_every=10, append=False, checkpoint=None):
+        """
+        Constructor
+        Args:
+            path : str
+                Path of the JSON Lines file
+            flush_every : int
+                Number of records written between two flushes
+            append : bool
+                If True, keep the existing records of the file
+            checkpoint : Checkpoint
+                Manifest flushed right after the records, so it never lists an article whose record is not on disk
+        """
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        self._flush_every = max(1, flush_every)
+        self._pending = 0
+        self._checkpoint = checkpoint
+        self.count = 0
+
+    @timed('io.write')
+    def write(self, record):
+        """
+        Write a record
+        Args:
+            record : dict
+        """
+        self._file.write(json.dumps(record) + '\n')
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._pending = 0
+        if self._checkpoint is not None:
+            self._checkpoint.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        if self._checkpoint is not None:
+            self._checkpoint.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_jsonl(path):
+    """
+    Read a JSON Lines file one record at a time
+    Args:
+        path : str
+    Returns:
+        _ : generator of dict
+    """
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def write_json_array(records, path):
+    """
+    Write a stream of records as a single JSON list, without holding them in memory
+    Args:
+        records : iterable of dict
+        path : str
+    Returns:
+        count : int
+            Number of records written
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('[')
+        for record in records:
+            if count:
+                file.write(', ')
+            json.dump(record, file)
+            count += 1
+        file.write(']')
+    return count
+
+def repair_jsonl(path):
+    """
+    Drop a partially written last line, left by a run killed in the middle of a write
+    Args:
+        path : str
+    """
+    if not os.path.isfile(path):
+        return
+    with open(path, 'rb+') as file:
+        data = file.read()
+        if data and not data.endswith(b'\n'):
+            file.truncate(data.rfind(b'\n') + 1)
+
+def latest_by_document(path):
+    """
+    Read a JSON Lines file of articles, keeping only the last record of each document
+    Resumed runs may append an article again if they died between writing it and recording it.
+    Args:
+        path : str
+    Returns:
+        _ : generator of dict
+    """
+    last = {}
+    for i, record in enumerate(read_jsonl(path)):
+        last[record['document']] = i
+    keep = set(last.values())
+    for i, record in enumerate(read_jsonl(path)):
+        if i in keep:
+            yield record
+
+def compact_jsonl(path, documents):
+    """
+    Rewrite a JSON Lines file of records with only the last record of each given document, in the given
+    order. Records of other documents, e.g. deleted articles, are dropped
+    Args:
+        path : str
+        documents : list of str
+    Returns:
+        count : int
+            Number of records kept
+    """
+    offsets = {}
+    with open(path, 'rb') as file:
+        pos = 0
+        for line in file:
+            if line.strip():
+                offsets[json.loads(line)['document']] = pos
+            pos += len(line)
+
+    count = 0
+    tmp = path + '.tmp'
+    with open(path, 'rb') as source, open(tmp, 'wb') as file:
+        for document in documents:
+            if document in offsets:
+                source.seek(offsets[document])
+                file.write(source.readline())
+                count += 1
+    os.replace(tmp, path)
+    return count
+
+def _sorted_by_document(path):
+    """
+    Records of a JSON Lines file sorted by document, streamed if the file is already sorted
+    Shards of a directory are, being written in file name order.
+    """
+    previous = None
+    for record in read_jsonl(path):
+        if previous is not None and record['document'] < previous:
+            return iter(sorted(latest_by_document(path), key=lambda record: record['document']))
+        previous = record['document']
+    return latest_by_document(path)
+
+def merge_jsonl(paths):
+    """
+    Merge JSON Lines outputs of shards into one stream of articles sorted by document
+    Args:
+        paths : list of str
+    Returns:
+        _ : generator of dict
+    """
+    return heapq.merge(*(_sorted_by_document(path) for path in paths), key=lambda record: record['document'])
+
+def content_hash(text):
+    """
+    SHA-1 of the text of an article
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class Checkpoint(object):
+    """
+    Checkpoint: manifest of the articles already processed, keyed by file name and content hash
+    """
+    def __init__(self, path, resume=False, version=None):
+        """
+        Constructor
+        Args:
+            path : str
+                Path of the manifest, a JSON Lines file of {"document", "hash", "mtime", "size", "version"} records
+            resume : bool
+                If True, load the existing manifest and keep appending to it, otherwise start a new one
+            version : str
+                Version of the pipeline, articles processed by another version are not done
+        """
+        self.path = path
+        self.version = version
+        self._latest = {}    # document -> its last record
+        if resume:
+            repair_jsonl(path)
+            if os.path.isfile(path):
+                for record in read_jsonl(path):
+                    self._latest[record['document']] = record
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def __len__(self):
+        return len(self._latest)
+
+    def documents(self):
+        """
+        Names of the recorded articles
+        """
+        return list(self._latest)
+
+    def done(self, document, hash):
+        """
+        Whether an article with this name and content was already processed by this pipeline version
+        """
+        record = self._latest.get(document)
+        return record is not None and record['hash'] == hash and record.get('version') == self.version
+
+    def unchanged(self, document, mtime, size):
+        """
+        Whether an article file was already processed by this pipeline version and has not been modified
+        since, so it need not even be read
+        """
+        record = self._latest.get(document)
+        return (mtime is not None and record is not None and record.get('mtime') == mtime
+                and record.get('size') == size and record.get('version') == self.version)
+
+    def add(self, document, hash, mtime=None, size=None):
+        """
+        Record a processed article, written at the next flush
+        Args:
+            document : str
+            hash : str
+                Content hash of the article, see content_hash
+            mtime : int
+                Modification time of the article file in ns, None for dump records
+            size : int
+                Size of the article in bytes
+        """
+        record = {'document' : document, 'hash' : hash, 'mtime' : mtime, 'size' : size, 'version' : self.version}
+        self._latest[document] = record
+        self._file.write(json.dumps(record) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,140 @@
+# import dependencies
+from collections import OrderedDict
+
+from profiler import timed
+
+# WordNet relations exposed as features, by feature name
+RELATIONS = {'hypernyms' : lambda synset: synset.hypernyms(),
+        'hyponyms' : lambda synset: synset.hyponyms(),
+        'meronyms' : lambda synset: synset.part_meronyms(),
+        'holonyms' : lambda synset: synset.part_holonyms()}
+
+class SynsetCache(object):
+    """
+    SynsetCache: bounded LRU cache of WordNet lookups keyed by (surface form, relation)
+    """
+    def __init__(self, maxsize=50000):
+        """
+        Constructor
+        Args:
+            maxsize : int
+                Maximum number of cached (surface form, relation) entries
+        """
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, compute):
+        """
+        Return the cached value of key, computing and caching it on a miss
+        """
+        try:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        except KeyError:
+            self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        return value
+
+    @timed('wordnet.synsets')
+    def synsets(self, word):
+        """
+        Synsets of a surface form
+        Args:
+            word : str
+        Returns:
+            _ : tuple of Synset
+        """
+        from nltk.corpus import wordnet
+        return self._get((word, 'synsets'), lambda: tuple(wordnet.synsets(word)))
+
+    @timed('wordnet.lookup')
+    def lookup(self, word, relation):
+        """
+        Related synsets of every synset of a surface form
+        Args:
+            word : str
+            relation : str
+                One of RELATIONS
+        Returns:
+            _ : tuple of list of Synset
+                One list of related synsets per synset of word
+        """
+        related = RELATIONS[relation]
+        return self._get((word, relation), lambda: tuple(related(x) for x in self.synsets(word)))
+
+    def stats(self):
+        """
+        Hit and miss counts and rates
+        Returns:
+            _ : dict
+        """
+        total = self.hits + self.misses
+        return {'hits' : self.hits,
+                'misses' : self.misses,
+                'hit_rate' : self.hits / total if total else 0.0,
+                'miss_rate' : self.misses / total if total else 0.0,
+                'size' : len(self._entries)}
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+# cache shared by every pipeline in the process
+_cache = SynsetCache()
+
+def get_cache():
+    """
+    Return the process-wide SynsetCache
+    """
+    return _cache
+
+class LazyRelation(object):
+    """
+    LazyRelation: WordNet relation feature computed on access
+    Indexing by sentence returns one list of related synsets per token, like the former eager lists.
+    """
+    def __init__(self, words, relation, cache=None):
+        """
+        Constructor
+        Args:
+            words : list(list(str))
+                Surface forms of the tokens per sentence, e.g. the 'text' column of a FeatureStore
+            relation : str
+                One of RELATIONS
+            cache : SynsetCache
+                Defaults to the process-wide cache
+        """
+        self._words = words
+        self._relation = relation
+        self._cache = cache if cache is not None else _cache
+
+    def __getstate__(self):
+        # the cache stays in its process, the unpickled feature uses the cache of its new process
+        return self._words, self._relation
+
+    def __setstate__(self, state):
+        self._words, self._relation = state
+        self._cache = _cache
+
+    def __len__(self):
+        return len(self._words)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return [list(self._cache.lookup(word, self._relation)) for word in self._words[i]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,322 @@
+# import dependencies
+from collections import defaultdict
+
+from features import register
+from profiler import get_profiler
+from scoring import pair_features, slot_scores
+
+class Slot(object):
+    """
+    Slot: argument of a template, filled with a named entity of the sentence
+    """
+    def __init__(self, name, types, path=None, dep=None, many=False, required=True, coref=False):
+        """
+        Constructor
+        Args:
+            name : str
+                Argument key in the extraction, e.g. '1'
+            types : tuple of str
+                Entity labels accepted, e.g. ('PERSON', 'ORG')
+            path : tuple of str
+                Dependency labels leading from the trigger token to the argument token, '*' matching any
+                label. The argument is the entity spanning the first token at the end of the path whose entity
+                type is accepted. If None, the argument is chosen among the entities of the whole sentence.
+            dep : tuple of str
+                If given, only entities spanning a token with one of these dependency labels are accepted
+            many : bool
+                If True, every candidate is used. Each candidate of the first many-slot of a template gives
+                an extraction, to which the candidates of the other many-slots are assigned one to one,
+                closest in the dependency tree first
+            required : bool
+                If False, the argument is None when no candidate is found
+            coref : bool
+                If True, a token reached by the path or carrying one of the dep labels that is not itself an
+                entity, e.g. a pronoun, stands for the named entity of its coreference cluster. Only used when
+                no entity is found, it makes the template need the 'coref' feature
+        """
+        self.name = name
+        self.types = tuple(types)
+        self.path = tuple(path) if path is not None else None
+        self.dep = tuple(dep) if dep is not None else None
+        self.many = many
+        self.required = required
+        self.coref = coref
+
+class TemplateSpec(object):
+    """
+    TemplateSpec: declarative description of a template
+    """
+    def __init__(self, name, triggers, slots, requires=None):
+        """
+        Constructor
+        Args:
+            name : str
+                Template name, e.g. 'BORN'
+            triggers : tuple of str
+                Lemmas of which at least one must be in a sentence for the template to be tried
+            slots : list of Slot
+                Arguments, filled in order. An entity used by a slot is not offered to the next ones
+            requires : dict
+                Minimum number of entities per group of labels, e.g. {('DATE',) : 1}
+        """
+        self.name = name
+        self.triggers = tuple(triggers)
+        self.slots = list(slots)
+        self.requires = dict(requires or {})
+
+        # features read by the engine for this template
+        features = ['lem', 'ents', 'dep', 'head']    # head is read by pair_features to score the candidates
+        if any(slot.path is not None for slot in self.slots):
+            features += ['text', 'ent_type']
+        if any(slot.coref for slot in self.slots):
+            features += ['coref']
+        self.features = tuple(features)
+
+# built-in templates
+register(TemplateSpec('BORN', ('bear',),    # Born is the past participle of the verb bear
+        [Slot('1', ('PERSON', 'ORG'), path=('*',), coref=True),   # the person or org being born, e.g. "He was born"
+        Slot('2', ('DATE',), path=('prep', '*'), required=False),   # preposition date
+        Slot('3', ('LOC', 'GPE'), path=('prep', '*'), required=False)]))  # preposition location
+
+register(TemplateSpec('BUY', ('acquire', 'buy'),
+        [Slot('1', ('ORG',), dep=('nsubj',), required=False, coref=True),    # buyer, the subject of the sentence
+        Slot('2', ('ORG',), many=True),    # acquired orgs, paired with the dates
+        Slot('3', ('DATE',), many=True)],
+        requires={('DATE',) : 1, ('ORG',) : 2}))
+
+register(TemplateSpec('PART_OF', ('in', 'be', 'part'),
+        [Slot('1', ('LOC', 'GPE')),   # LOC: Non-GPE locations, mountain ranges, bodies of water.; GPE: Countries, cities, states.
+        Slot('2', ('LOC', 'GPE'))],
+        requires={('LOC', 'GPE') : 2}))
+
+class TemplateEngine(object):
+    """
+    TemplateEngine: fills a set of TemplateSpecs in a single pass over the trigger sentences
+    """
+    def __init__(self, specs):
+        """
+        Constructor
+        Args:
+            specs : list of TemplateSpec
+        """
+        self._specs = list(specs)
+        self._by_trigger = defaultdict(list)
+        for spec in self._specs:
+            for trigger in spec.triggers:
+                self._by_trigger[trigger].append(spec)
+        self._triggers = tuple(self._by_trigger)
+
+    def fill(self, sents, features):
+        """
+        Fill the templates of an article
+        Args:
+            sents : list of str
+                A list of str per article
+            features : FeatureStore
+                Features per sentence
+        Returns:
+            res : list
+                A list of filled templates, grouped by template in spec order
+        """
+        lem, ents, dep = features['lem'], features['ents'], features['dep']
+        profiler = get_profiler()
+
+        # templates triggered by each sentence, each tried once, at its first trigger token
+        triggered = []
+        for i in features.sentences_with(*self._triggers):
+            lemmas = lem[i]
+            sentence = _Sentence(features, i, lemmas, ents[i], dep[i])
+            tried = set()
+            for index, lemma in enumerate(lemmas):
+                for spec in self._by_trigger.get(lemma, ()):
+                    if spec.name not in tried:
+                        tried.add(spec.name)
+                        if self._ready(spec, sentence):
+                            triggered.append((spec, sentence, index))
+
+        # score the entities of every trigger of the article at once
+        tasks = sorted(set((sentence.i, index) for spec, sentence, index in triggered))
+        if tasks:
+            if profiler.enabled:
+                scores = profiler.call('template.score', pair_features, features, tasks)
+            else:
+                scores = pair_features(features, tasks)
+            for spec, sentence, index in triggered:
+                sentence.pairs.setdefault(index, scores.get((sentence.i, index)))
+
+        res = {spec.name : [] for spec in self._specs}
+        for spec, sentence, index in triggered:
+            if profiler.enabled:
+                matches = profiler.call('template.' + spec.name, self._match, spec, sentence, index)
+            else:
+                matches = self._match(spec, sentence, index)
+            for arguments in matches:
+                res[spec.name].append({
+                    'template' : spec.name,
+                    'sentences' : sents[sentence.i],
+                    'arguments' : arguments})
+        return [extraction for spec in self._specs for extraction in res[spec.name]]
+
+    def _ready(self, spec, sentence):
+        """
+        Whether a sentence has the entities required by a template
+        """
+        for labels, count in spec.requires.items():
+            if sum(len(sentence.by_label(label)) for label in labels) < count:
+                return False
+        return True
+
+    def _match(self, spec, sentence, index):
+        """
+        Fill the slots of a template in a sentence
+        Args:
+            spec : TemplateSpec
+            sentence : _Sentence
+            index : int
+                Index of the trigger token in the sentence
+        Returns:
+            _ : list of dict
+                Arguments of each extraction
+        """
+        used = set()    # keys and texts of the entities already used, an entity mentioned twice is used once
+        single = {}
+        many = []
+        for slot in spec.slots:
+            candidates = []
+            for key, text in sentence.candidates(slot, index):
+                if key not in used and text not in used:
+                    candidates.append((key, text))
+                    if slot.many:
+                        used.update((key, text))
+            if slot.many:
+                many.append((slot.name, candidates))
+            elif candidates:
+                key, text = sentence.best(slot, index, candidates)
+                used.update((key, text))
+                single[slot.name] = text
+            elif slot.required:
+                return []
+            else:
+                single[slot.name] = None
+
+        if not many:
+            return [single]
+        # one extraction per candidate of the first many-slot, e.g. per acquired org
+        (name, anchors), others = many[0], many[1:]
+        matched = [{name : text} for key, text in anchors]
+        for other, candidates in others:
+            for a, c in sentence.assign(index, anchors, candidates):
+                matched[a][other] = candidates[c][1]
+        res = []
+        for arguments in matched:
+            if len(arguments) == len(many):
+                arguments.update(single)
+                res.append({slot.name : arguments[slot.name] for slot in spec.slots})
+        return res
+
+class _Sentence(object):
+    """
+    Features of a sentence shared by every template tried on it
+    """
+    def __init__(self, features, i, lemmas, ents, dep):
+        self._features = features
+        self.i = i
+        self.lemmas = lemmas
+        self.ents = ents
+        self.dep = dep
+        # trigger index -> pair features of the entities, see pair_features
+        self.pairs = {}
+
+    def by_label(self, label):
+        return self._features.entities(self.i, label)
+
+    def candidates(self, slot, index):
+        """
+        Candidate arguments of a slot, in order
+        Returns:
+            _ : list of (tuple, str)
+                (key, text) pairs, the key identifying the entity or token used
+        """
+        if slot.path is not None:
+            return self._path_candidates(slot, index)
+
+        ids = self._features.entities(self.i, *slot.types)
+        if slot.dep is not None:
+            # entities aligned with a token of the dependency labels, e.g. the subject
+            tokens = [j for j, label in enumerate(self.dep) if label in slot.dep]
+            spanning = {self._features.entity_at(self.i, j) for j in tokens}
+            ids = [j for j in ids if j in spanning]
+            if not ids and slot.coref:
+                return [c for c in (self._coref_candidate(slot, j) for j in tokens) if c is not None]
+        return [(('ent', j), self.ents[j][0]) for j in ids]
+
+    def _coref_candidate(self, slot, j):
+        """
+        Named entity token j refers to through coreference, if it has one of the types of the slot
+        """
+        name = self._features.resolve(self.i, j)
+        if name is None or name[1] not in slot.types:
+            return None
+        return ('coref', name[0]), name[0]
+
+    def best(self, slot, index, candidates):
+        """
+        Highest scoring candidate of a slot, the first one if the entities were not scored
+        Candidates that are not entities, e.g. resolved through coreference, are only taken when no entity is a
+        candidate, in order.
+        """
+        pairs = self.pairs.get(index)
+        if pairs is None:
+            return candidates[0]
+        tree, linear, deps, labels, distances = pairs
+        scores = slot_scores(slot, tree, linear, deps, labels)
+        return max(candidates, key=lambda candidate: scores[candidate[0][1]] if candidate[0][0] == 'ent' else float('-inf'))
+
+    def assign(self, index, anchors, candidates):
+        """
+        Assign candidates to anchors one to one, the pairs closest in the dependency tree first, e.g. each date
+        to the acquired org it modifies. In sentence order if the entities were not scored
+        Args:
+            index : int
+                Index of the trigger token in the sentence
+            anchors, candidates : list of (tuple, str)
+                Candidates of two slots, see candidates
+        Returns:
+            _ : list of (int, int)
+                (anchor, candidate) positions of the assigned pairs
+        """
+        pairs = self.pairs.get(index)
+        if pairs is None:
+            return list(zip(range(len(anchors)), range(len(candidates))))
+        distances = pairs[-1]
+        def distance(a, c):
+            (kind_a, j_a), (kind_c, j_c) = anchors[a][0], candidates[c][0]
+            if kind_a != 'ent' or kind_c != 'ent':
+                return float('inf')
+            return distances[j_a, j_c]
+        # ties broken in sentence order
+        ranked = sorted((distance(a, c), a, c) for a in range(len(anchors)) for c in range(len(candidates)))
+        res = []
+        seen_a, seen_c = set(), set()
+        for d, a, c in ranked:
+            if a not in seen_a and c not in seen_c:
+                seen_a.add(a)
+                seen_c.add(c)
+                res.append((a, c))
+        return res
+
+    def _path_candidates(self, slot, index):
+        nodes = [self._features.token(self.i, index)]
+        for label in slot.path:
+            nodes = [child for node in nodes for child in node.children if label == '*' or child.dep_ == label]
+        res = []
+        for node in nodes:
+            if node.ent_type_ not in slot.types:
+                continue
+            # the whole entity rather than the single token, e.g. "New York" rather than "York"
+            j = self._features.entity_at(self.i, node.i)
+            res.append((('ent', j), self.ents[j][0]) if j is not None else (('tok', node.i), node.text))
+        if not res and slot.coref:
+            # pronouns only stand in for the argument when the path reaches no entity
+            res = [candidate for candidate in (self._coref_candidate(slot, node.i) for node in nodes) if candidate is not None]
+        return res
@@ -0,0 +1,6 @@
+# import dependencies
+import os
+import sys
+
+# the modules of h-at are top-level files of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
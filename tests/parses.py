@@ -0,0 +1,122 @@
+# import dependencies
+from feature_store import FeatureStore
+from parse_cache import COREF_KEY
+
+class Token(object):
+    """
+    Token: stand-in for a parsed spaCy Token, with the attributes read by FeatureStore.add_sentence
+    """
+    def __init__(self, doc, i, idx, text, lemma, dep, head, ent_type):
+        self._doc = doc
+        self.i = i
+        self.idx = idx
+        self.text = text
+        self.lemma_ = lemma
+        self.pos_ = ''
+        self.tag_ = ''
+        self.dep_ = dep
+        self.ent_type_ = ent_type
+        self._head = head
+
+    @property
+    def head(self):
+        return self._doc[self._head]
+
+class Span(object):
+    """
+    Span: stand-in for a spaCy Span, a sentence or an entity
+    """
+    def __init__(self, doc, start, end, label=''):
+        self._doc = doc
+        self.start = start
+        self.end = end
+        self.label_ = label
+        self.start_char = doc[start].idx if end > start else 0
+        self.end_char = doc[end - 1].idx + len(doc[end - 1].text) if end > start else 0
+        self.text = doc.text[self.start_char:self.end_char]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __iter__(self):
+        return (self._doc[i] for i in range(self.start, self.end))
+
+    def __getitem__(self, k):
+        return self._doc[self.start + k]
+
+    @property
+    def root(self):
+        return next(token for token in self if token.head is token or not self.start <= token.head.i < self.end)
+
+    @property
+    def ents(self):
+        # consecutive tokens with the same label form one entity
+        res = []
+        for token in self:
+            if not token.ent_type_:
+                continue
+            if res and res[-1].end == token.i and res[-1].label_ == token.ent_type_:
+                res[-1] = Span(self._doc, res[-1].start, token.i + 1, token.ent_type_)
+            else:
+                res.append(Span(self._doc, token.i, token.i + 1, token.ent_type_))
+        return res
+
+class Doc(object):
+    """
+    Doc: stand-in for a parsed spaCy Doc, its tokens separated by single spaces
+    """
+    def __init__(self, sentences, coref=None):
+        """
+        Constructor
+        Args:
+            sentences : list of list of tuple
+                (text, lemma, dep, head, entity label) per token, the head being an index in the sentence
+                and consecutive tokens with the same label forming one entity
+            coref : list(list(tuple(int, int)))
+                Coreference clusters in token indices, stored as the parse cache does
+        """
+        self._tokens = []
+        self.text = ''
+        bounds = []
+        for sentence in sentences:
+            start = len(self._tokens)
+            for text, lemma, dep, head, label in sentence:
+                if self.text:
+                    self.text += ' '
+                self._tokens.append(Token(self, len(self._tokens), len(self.text), text, lemma, dep, start + head, label))
+                self.text += text
+            bounds.append((start, len(self._tokens)))
+        self.sents = [Span(self, start, end) for start, end in bounds]
+        self.ents = [ent for sent in self.sents for ent in sent.ents]
+        self.user_data = {COREF_KEY : coref or []}
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Span(self, key.start, key.stop)
+        return self._tokens[key]
+
+def build(sentences, keys, coref=None):
+    """
+    FeatureStore of a mocked parse
+    Args:
+        sentences : list of list of tuple
+            Tokens of each sentence, see Doc
+        keys : set of str
+            Features of the store, e.g. resolve(['BUY'])
+        coref : list(list(tuple(int, int)))
+            Coreference clusters in document token indices
+    Returns:
+        _ : FeatureStore
+    """
+    features = FeatureStore(keys)
+    for sent in Doc(sentences).sents:
+        features.add_sentence(sent, sent.root, sent.ents, sent.start_char)
+    if coref is not None:
+        features.set_coref(coref)
+    return features
@@ -0,0 +1,103 @@
+# import dependencies
+import json
+import os
+from array import array
+
+import pytest
+
+from corpus import DumpFile, WikiDir, shard_of, parse_shard
+
+def write_dump(path, records, newline=True):
+    lines = [json.dumps({'title' : title, 'text' : text}) if title is not None else '' for title, text in records]
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + ('\n' if newline else ''))
+
+def read_all(path, **kwargs):
+    dump = DumpFile(path)
+    try:
+        return len(dump), list(dump.articles(**kwargs))
+    finally:
+        dump.close()
+
+def test_dump_records(tmpdir):
+    path = os.path.join(str(tmpdir), 'dump.jsonl')
+    write_dump(path, [('A', 'first\n\n  second\n'), (None, None), ('B', 'é')])
+    # blank lines are records without an article
+    assert read_all(path) == (3, [('A', 'first\n\nsecond'), ('B', 'é')])
+    assert read_all(path, start=1)[1] == [('B', 'é')]
+    assert read_all(path, stop=1)[1] == [('A', 'first\n\nsecond')]
+
+    sizes = []
+    assert read_all(path, skip=lambda title, mtime, size: sizes.append((title, mtime, size)) or title == 'A')[1] == [('B', 'é')]
+    assert [(title, mtime) for title, mtime, size in sizes] == [('A', None), ('B', None)]
+
+def test_dump_without_trailing_newline(tmpdir):
+    path = os.path.join(str(tmpdir), 'dump.jsonl')
+    write_dump(path, [('A', 'a'), ('B', 'b')], newline=False)
+    assert read_all(path) == (2, [('A', 'a'), ('B', 'b')])
+
+def test_empty_dump(tmpdir):
+    path = os.path.join(str(tmpdir), 'dump.jsonl')
+    open(path, 'w').close()
+    assert read_all(path) == (0, [])
+    assert read_all(path) == (0, [])    # from the saved index
+    dump = DumpFile(path)
+    assert dump.nbytes() == 0
+    dump.close()
+
+def test_index_rebuilt(tmpdir):
+    path = os.path.join(str(tmpdir), 'dump.jsonl')
+    write_dump(path, [('A', 'a'), ('B', 'b')])
+    assert read_all(path)[1] == [('A', 'a'), ('B', 'b')]
+    index = os.path.getmtime(path + '.idx')
+
+    # modified after the index was written
+    write_dump(path, [('C', 'c'), ('D', 'longer text'), ('E', 'e')])
+    os.utime(path, (index + 10, index + 10))
+    assert read_all(path)[1] == [('C', 'c'), ('D', 'longer text'), ('E', 'e')]
+
+    # replaced by a file that looks older than the index, caught by its size
+    write_dump(path, [('F', 'f')])
+    os.utime(path, (index - 10, index - 10))
+    assert read_all(path)[1] == [('F', 'f')]
+
+    # index of offsets only, written by an older version
+    write_dump(path, [('G', 'g'), ('H', 'h')])
+    os.utime(path, (index - 10, index - 10))
+    with open(path, 'rb') as file:
+        data = file.read()
+    offsets = array('Q', [0, data.index(b'\n') + 1, len(data)])
+    with open(path + '.idx', 'wb') as file:
+        offsets.tofile(file)
+    assert read_all(path)[1] == [('G', 'g'), ('H', 'h')]
+    assert os.path.getsize(path + '.idx') == 5 * offsets.itemsize
+
+def test_parse_shard():
+    assert parse_shard('0/1') == (0, 1)
+    assert parse_shard('3/4') == (3, 4)
+    for value in ('4/4', '-1/4', '1', 'a/b', '1/0'):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+TITLES = ['Article {}'.format(k) for k in range(50)]
+
+@pytest.mark.parametrize('n', [1, 3, 7])
+def test_dump_shards(tmpdir, n):
+    path = os.path.join(str(tmpdir), 'dump.jsonl')
+    write_dump(path, [(title, title) for title in TITLES])
+    shards = [[title for title, text in read_all(path, shard=(i, n))[1]] for i in range(n)]
+    # disjoint, covering every title, each in corpus order and in the shard of its title
+    assert sorted(title for shard in shards for title in shard) == sorted(TITLES)
+    for i, shard in enumerate(shards):
+        assert shard == [title for title in TITLES if shard_of(title, n) == i]
+    if n > 1:
+        assert all(shards)
+
+def test_wiki_dir_shards(tmpdir):
+    for title in TITLES:
+        with open(os.path.join(str(tmpdir), title), 'w') as file:
+            file.write(title)
+    wiki = WikiDir(str(tmpdir))
+    shards = [[title for title, text in wiki.articles(shard=(i, 3))] for i in range(3)]
+    assert sorted(title for shard in shards for title in shard) == sorted(TITLES)
+    assert [shard_of(title, 3) for shard in shards for title in shard] == sorted(shard_of(title, 3) for title in TITLES)
@@ -0,0 +1,38 @@
+# import dependencies
+import gc
+import multiprocessing
+
+import pytest
+
+import engine
+from engine import BatchEngine
+
+class StubNLP(object):
+    """
+    StubNLP: stand-in for NLP, reporting whether the garbage collector of its process had frozen objects
+    """
+    def __init__(self, **kwargs):
+        pass
+
+    def load(self):
+        return self
+
+    def pipe(self, inputs, batch_size=16):
+        for title, text in inputs:
+            yield title, [text], None, None
+
+    def fill(self, title, sents, features):
+        return {'document' : title, 'extractions' : [], 'frozen' : gc.get_freeze_count()}
+
+@pytest.mark.skipif(not hasattr(gc, 'freeze') or 'fork' not in multiprocessing.get_all_start_methods(),
+        reason='needs gc.freeze and the fork start method')
+def test_fork_freezes_only_while_forking(monkeypatch):
+    monkeypatch.setattr(engine, 'NLP', StubNLP)
+    batch_engine = BatchEngine(batch_size=2, n_process=2, fork=True)
+    articles = [('doc{}'.format(k), 'text') for k in range(7)]
+    for _ in range(2):
+        outputs = list(batch_engine.run(articles))
+        assert [output['document'] for output in outputs] == [title for title, text in articles]
+        # the workers were forked with frozen objects, the parent collects them again
+        assert all(output['frozen'] > 0 for output in outputs)
+        assert gc.get_freeze_count() == 0
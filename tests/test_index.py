@@ -0,0 +1,66 @@
+# import dependencies
+import pytest
+
+from index import normalize, build_index, ExtractionIndex
+
+@pytest.mark.parametrize('text', ["Apple", "Apple's", "Apple's.", "(Apple's)", "the  APPLE’s,"])
+def test_normalize(text):
+    assert normalize(text) == 'apple'
+
+def article(document, *extractions):
+    return {'document' : document,
+            'extractions' : [{'template' : template, 'sentences' : sentence, 'arguments' : arguments}
+                    for template, sentence, arguments in extractions]}
+
+ARTICLES = [article('Google.txt',
+                ('BUY', 'Google bought YouTube in 2006.', {'1' : 'Google', '2' : 'YouTube', '3' : '2006'}),
+                ('BUY', 'Google bought YouTube in 2006.', {'1' : 'Google', '2' : 'YouTube', '3' : '2006'})),
+        article('YouTube.txt',
+                ('BUY', "YouTube was bought by Google's.", {'1' : "Google's", '2' : 'the YouTube', '3' : '2006'}),
+                ('BORN', 'Chad Hurley was born in Reading.', {'1' : 'Chad Hurley', '2' : None, '3' : 'Reading'})),
+        article('Empty.txt')]
+
+@pytest.fixture
+def index(tmpdir):
+    assert build_index(ARTICLES, str(tmpdir)) == (2, 4)
+    index = ExtractionIndex(str(tmpdir))
+    yield index
+    index.close()
+
+def test_deduplicated(index):
+    assert len(index) == 2
+    buy = index.get(0)
+    assert buy['arguments'] == {'1' : 'google', '2' : 'youtube', '3' : '2006'}
+    assert buy['text'] == {'1' : 'Google', '2' : 'YouTube', '3' : '2006'}
+    # the same sentence of a document is a source once
+    assert buy['sources'] == [{'document' : 'Google.txt', 'sentence' : 'Google bought YouTube in 2006.'},
+            {'document' : 'YouTube.txt', 'sentence' : "YouTube was bought by Google's."}]
+    assert index.get(1)['arguments'] == {'1' : 'chad hurley', '2' : None, '3' : 'reading'}
+
+def test_lookup(index):
+    assert list(index.lookup('a\tgoogle')) == [0]
+    assert list(index.lookup('t\tBORN')) == [1]
+    # first and last of the sorted terms
+    assert list(index.lookup('a\t2006')) == [0]
+    assert list(index.lookup('t\tBUY')) == [0]
+    # before the first, between two, and after the last term
+    for term in ('a\tapple', 'a\t', '', 'a\t1999', 'z', 't\tBUZ'):
+        assert list(index.lookup(term)) == []
+
+def test_query(index):
+    assert index.query() == [0, 1]
+    assert index.query(template='BUY') == [0]
+    assert index.query(argument="The Google's") == [0]
+    assert index.query(template='BORN', argument='Google') == []
+    assert index.query(template='BUY', argument='Google', slot='1') == [0]
+    assert index.query(template='BUY', argument='Google', slot='2') == []
+    assert index.query(template='BORN', argument='Reading', slot='3') == [1]
+
+def test_empty_index(tmpdir):
+    assert build_index([article('Empty.txt')], str(tmpdir)) == (0, 0)
+    index = ExtractionIndex(str(tmpdir))
+    assert len(index) == 0
+    assert list(index.lookup('t\tBUY')) == []
+    assert index.query() == []
+    assert index.query(template='BUY') == []
+    index.close()
@@ -0,0 +1,202 @@
+# import dependencies
+import json
+import os
+import sys
+
+import corpus
+import main
+import merge
+from main import IE
+from storage import Checkpoint, read_jsonl
+
+class ReadAheadEngine(object):
+    """
+    ReadAheadEngine: stand-in for BatchEngine reading its whole input before the first output, as nlp.pipe
+    batches and worker chunks do
+    """
+    def __init__(self):
+        self.inputs = []
+
+    def run(self, inputs):
+        self.inputs = list(inputs)
+        for title, text in self.inputs:
+            yield {'document' : title, 'extractions' : []}
+
+def write_dump(path, records):
+    with open(path, 'w', encoding='utf-8') as file:
+        for title, text in records:
+            file.write(json.dumps({'title' : title, 'text' : text}) + '\n')
+
+def test_extract_repeated_title(tmpdir):
+    dump = os.path.join(str(tmpdir), 'dump.jsonl')
+    write_dump(dump, [('A', 'first'), ('B', 'other'), ('A', 'second')])
+    ie = IE()
+    ie._engine = ReadAheadEngine()
+    checkpoint = Checkpoint(os.path.join(str(tmpdir), 'manifest.jsonl'), version=ie.version)
+    outputs = list(ie.extract(dump, checkpoint=checkpoint))
+    checkpoint.close()
+
+    assert [output['document'] for output in outputs] == ['A', 'B', 'A']
+    assert ie.documents == ['A', 'B', 'A']
+    # each record is checkpointed with its own hash, the last one being kept
+    manifest = list(read_jsonl(checkpoint.path))
+    assert [record['document'] for record in manifest] == ['A', 'B', 'A']
+    assert manifest[0]['hash'] != manifest[2]['hash']
+
+class StubEngine(object):
+    """
+    StubEngine: stand-in for BatchEngine in main.main, recording the articles it is given
+    """
+    processed = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def run(self, inputs):
+        for title, text in inputs:
+            StubEngine.processed.append(title)
+            yield {'document' : title, 'extractions' : [{'template' : 'T', 'sentences' : text, 'arguments' : {}}]}
+
+def write_wiki(wiki, articles):
+    os.makedirs(wiki, exist_ok=True)
+    for title, text in articles.items():
+        with open(os.path.join(wiki, title), 'w', encoding='latin-1') as file:
+            file.write(text)
+
+def run_main(monkeypatch, tmpdir, *options, output='output.json'):
+    """
+    Run main.py over tmpdir/wiki with the stub engine, writing tmpdir/output
+    Returns:
+        processed : list of str
+            Articles given to the engine
+        output : list of dict
+            Records of the output JSON
+    """
+    out = os.path.join(str(tmpdir), output)
+    monkeypatch.setattr(main, 'BatchEngine', StubEngine)
+    monkeypatch.setattr(sys, 'argv', ['main.py', '-w', os.path.join(str(tmpdir), 'wiki'), '-o', out] + list(options))
+    StubEngine.processed = []
+    main.main(main.get_args())
+    with open(out, encoding='utf-8') as file:
+        return StubEngine.processed, json.load(file)
+
+def paths(tmpdir):
+    return os.path.join(str(tmpdir), 'output.jsonl'), os.path.join(str(tmpdir), 'output.manifest.jsonl')
+
+def keep_lines(path, count):
+    with open(path, encoding='utf-8') as file:
+        lines = file.readlines()
+    with open(path, 'w', encoding='utf-8') as file:
+        file.writelines(lines[:count])
+
+def test_resume_interrupted_run(monkeypatch, tmpdir):
+    write_wiki(os.path.join(str(tmpdir), 'wiki'), {'A.txt' : 'a', 'B.txt' : 'b', 'C.txt' : 'c'})
+    processed, output = run_main(monkeypatch, tmpdir)
+    assert processed == ['A.txt', 'B.txt', 'C.txt']
+
+    # killed while writing C: its record is cut and the manifest does not list it
+    jsonl, manifest = paths(tmpdir)
+    with open(jsonl, 'rb') as file:
+        data = file.read()
+    with open(jsonl, 'wb') as file:
+        file.write(data[:-10])
+    keep_lines(manifest, 2)
+
+    processed, output = run_main(monkeypatch, tmpdir, '--resume')
+    assert processed == ['C.txt']
+    assert [record['document'] for record in output] == ['A.txt', 'B.txt', 'C.txt']
+    assert [record['document'] for record in read_jsonl(jsonl)] == ['A.txt', 'B.txt', 'C.txt']
+
+def test_resume_record_not_in_manifest(monkeypatch, tmpdir):
+    write_wiki(os.path.join(str(tmpdir), 'wiki'), {'A.txt' : 'a', 'B.txt' : 'b'})
+    run_main(monkeypatch, tmpdir)
+
+    # killed after writing B but before recording it in the manifest
+    jsonl, manifest = paths(tmpdir)
+    keep_lines(manifest, 1)
+
+    processed, output = run_main(monkeypatch, tmpdir, '--resume')
+    assert processed == ['B.txt']
+    # B is appended again, the output keeps its latest record only
+    assert [record['document'] for record in read_jsonl(jsonl)] == ['A.txt', 'B.txt', 'B.txt']
+    assert [record['document'] for record in output] == ['A.txt', 'B.txt']
+
+def test_incremental(monkeypatch, tmpdir):
+    wiki = os.path.join(str(tmpdir), 'wiki')
+    write_wiki(wiki, {'A.txt' : 'a', 'B.txt' : 'b', 'C.txt' : 'c'})
+    jsonl, manifest = paths(tmpdir)
+    read = []
+    read_wiki_file = corpus.read_wiki_file
+    monkeypatch.setattr(corpus, 'read_wiki_file', lambda path: read.append(os.path.basename(path)) or read_wiki_file(path))
+    def latest(document):
+        return [record for record in read_jsonl(manifest) if record['document'] == document][-1]
+
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental')
+    assert processed == ['A.txt', 'B.txt', 'C.txt']
+
+    # unchanged files are not even read
+    del read[:]
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental')
+    assert processed == [] and read == []
+    assert [record['document'] for record in output] == ['A.txt', 'B.txt', 'C.txt']
+
+    # touched without a change of content: read, recorded with its new time, not processed
+    mtime = latest('B.txt')['mtime'] + 10 ** 9
+    os.utime(os.path.join(wiki, 'B.txt'), ns=(mtime, mtime))
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental')
+    assert processed == [] and read == ['B.txt']
+    assert latest('B.txt')['mtime'] == mtime
+    del read[:]
+    run_main(monkeypatch, tmpdir, '--incremental')
+    assert read == []
+
+    # modified: processed again, only its latest record kept
+    write_wiki(wiki, {'C.txt' : 'c modified'})
+    mtime = latest('C.txt')['mtime'] + 10 ** 9
+    os.utime(os.path.join(wiki, 'C.txt'), ns=(mtime, mtime))
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental')
+    assert processed == ['C.txt']
+    assert [record['document'] for record in read_jsonl(jsonl)] == ['A.txt', 'B.txt', 'C.txt']
+    assert output[2]['extractions'][0]['sentences'] == 'c modified'
+    assert [record['document'] for record in read_jsonl(manifest)] == ['A.txt', 'B.txt', 'C.txt']
+
+    # deleted: dropped from the manifest and the records
+    os.remove(os.path.join(wiki, 'A.txt'))
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental')
+    assert processed == []
+    assert [record['document'] for record in output] == ['B.txt', 'C.txt']
+    assert [record['document'] for record in read_jsonl(jsonl)] == ['B.txt', 'C.txt']
+    assert [record['document'] for record in read_jsonl(manifest)] == ['B.txt', 'C.txt']
+
+def test_incremental_version(monkeypatch, tmpdir):
+    write_wiki(os.path.join(str(tmpdir), 'wiki'), {'A.txt' : 'a', 'B.txt' : 'b'})
+    run_main(monkeypatch, tmpdir, '--incremental')
+    assert run_main(monkeypatch, tmpdir, '--incremental')[0] == []
+
+    # another option reprocesses every article
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental', '-t', 'BORN')
+    assert processed == ['A.txt', 'B.txt']
+    assert run_main(monkeypatch, tmpdir, '--incremental', '-t', 'BORN')[0] == []
+
+    # so does another version of the pipeline
+    monkeypatch.setattr(main, 'PIPELINE_VERSION', main.PIPELINE_VERSION + 1)
+    processed, output = run_main(monkeypatch, tmpdir, '--incremental', '-t', 'BORN')
+    assert processed == ['A.txt', 'B.txt']
+    assert [record['document'] for record in output] == ['A.txt', 'B.txt']
+
+def test_shards_merged(monkeypatch, tmpdir):
+    wiki = os.path.join(str(tmpdir), 'wiki')
+    write_wiki(wiki, {'{:02d}.txt'.format(k) : str(k) for k in range(20)})
+    processed, whole = run_main(monkeypatch, tmpdir)
+
+    outputs = []
+    for i in range(3):
+        output = 'output.shard-{}-of-3.json'.format(i)
+        run_main(monkeypatch, tmpdir, '--shard', '{}/3'.format(i), output=output)
+        outputs.append(os.path.join(str(tmpdir), os.path.splitext(output)[0] + '.jsonl'))
+
+    merged = os.path.join(str(tmpdir), 'merged.json')
+    monkeypatch.setattr(sys, 'argv', ['merge.py', '-o', merged] + outputs[::-1])
+    merge.main(merge.get_args())
+    with open(merged, encoding='utf-8') as file:
+        assert json.load(file) == whole
@@ -0,0 +1,49 @@
+# import dependencies
+from nlp import NLP
+from parses import Doc
+
+# John Smith was born in Ohio .
+S1 = [('John', 'john', 'compound', 1, 'PERSON'), ('Smith', 'smith', 'nsubjpass', 3, 'PERSON'), ('was', 'be', 'auxpass', 3, ''),
+        ('born', 'bear', 'ROOT', 3, ''), ('in', 'in', 'prep', 3, ''), ('Ohio', 'ohio', 'pobj', 4, 'GPE'), ('.', '.', 'punct', 3, '')]
+# He moved to Texas .
+S2 = [('He', 'he', 'nsubj', 1, ''), ('moved', 'move', 'ROOT', 1, ''), ('to', 'to', 'prep', 1, ''),
+        ('Texas', 'texas', 'pobj', 2, 'GPE'), ('.', '.', 'punct', 1, '')]
+# He was born in 1950 .
+S3 = [('He', 'he', 'nsubjpass', 2, ''), ('was', 'be', 'auxpass', 2, ''), ('born', 'bear', 'ROOT', 2, ''),
+        ('in', 'in', 'prep', 2, ''), ('1950', '1950', 'pobj', 3, 'DATE'), ('.', '.', 'punct', 2, '')]
+
+def join(*windows):
+    """
+    Article built from (doc, body) windows, as NLP.pipe does
+    """
+    nlp = NLP(templates=['BORN'])
+    article = nlp._new_article()
+    for doc, body in windows:
+        nlp._add_window(article, doc, body)
+    sents, tokens, features = nlp._finish_article(article)
+    return nlp, sents, tokens, features
+
+def check(nlp, sents, tokens, features):
+    # every sentence once, the pronoun of the last window resolved through the cluster of the first
+    assert sents == ['John Smith was born in Ohio .', 'He moved to Texas .', 'He was born in 1950 .']
+    assert len(tokens) == 18
+    assert len(features) == 3
+    assert features['coref'] == [[(0, 2), (7, 8), (12, 13)]]
+    assert features.resolve(2, 0) == ('John Smith', 'PERSON')
+    output = nlp.fill('John Smith', sents, features)
+    assert [e['arguments'] for e in output['extractions']] == [{'1' : 'John Smith', '2' : None, '3' : 'Ohio'},
+            {'1' : 'John Smith', '2' : '1950', '3' : None}]
+
+def test_join_windows():
+    first = Doc([S1, S2], coref=[[(0, 2), (7, 8)]])
+    # the second window starts with the last sentence of the first as context
+    second = Doc([S2, S3], coref=[[(0, 1), (5, 6)]])
+    check(*join((first, 0), (second, second.sents[1].start_char)))
+
+def test_join_windows_sentence_across_cut():
+    first = Doc([S1, S2], coref=[[(0, 2), (7, 8)]])
+    # spaCy did not break the second window at its body, the context sentence runs into it
+    merged = S2 + [(text, lemma, dep, head + len(S2), label) for text, lemma, dep, head, label in S3]
+    second = Doc([merged], coref=[[(0, 1), (5, 6)]])
+    body = second[len(S2)].idx
+    check(*join((first, 0), (second, body)))
@@ -0,0 +1,38 @@
+# import dependencies
+import os
+
+import pytest
+
+from parse_cache import ParseCache, COREF_KEY
+
+spacy = pytest.importorskip('spacy')
+srsly = pytest.importorskip('srsly')
+
+KEY = 'ab' * 32
+
+def test_round_trip(tmpdir):
+    nlp = spacy.blank('en')
+    cache = ParseCache(str(tmpdir))
+    cache.put(KEY, nlp('John Smith was born in Ohio.'), [[(0, 2)]])
+    doc = cache.get(KEY, nlp.vocab)
+    assert [token.text for token in doc] == ['John', 'Smith', 'was', 'born', 'in', 'Ohio', '.']
+    assert doc.user_data[COREF_KEY] == [[(0, 2)]]
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_overwrite_keeps_size(tmpdir):
+    nlp = spacy.blank('en')
+    cache = ParseCache(str(tmpdir))
+    cache.put(KEY, nlp('John Smith was born in Ohio.'))
+    cache.put(KEY, nlp('John Smith was born in Ohio in 1990.'))
+    assert cache._size == os.path.getsize(cache._path(KEY))
+
+def test_corrupt_entry_is_miss(tmpdir):
+    nlp = spacy.blank('en')
+    cache = ParseCache(str(tmpdir))
+    assert cache.get(KEY, nlp.vocab) is None
+    os.makedirs(os.path.dirname(cache._path(KEY)))
+    for data in (b'\x93garbage', srsly.msgpack_dumps({'doc' : b'garbage', 'coref' : None}), srsly.msgpack_dumps([])):
+        with open(cache._path(KEY), 'wb') as file:
+            file.write(data)
+        assert cache.get(KEY, nlp.vocab) is None
+    assert (cache.hits, cache.misses) == (0, 4)
@@ -0,0 +1,100 @@
+# import dependencies
+import asyncio
+import json
+
+import pytest
+
+import service
+from service import ExtractionService, HTTPServer
+
+class StubEngine(object):
+    """
+    StubEngine: stand-in for BatchEngine recording the size of every batch
+    """
+    def __init__(self, **kwargs):
+        self.batches = []
+
+    def load(self):
+        return self
+
+    def run(self, articles):
+        self.batches.append(len(articles))
+        for title, text in articles:
+            if text == 'fail':
+                raise RuntimeError('parse failed')
+            yield {'document' : title, 'extractions' : [{'template' : 'T', 'sentences' : text, 'arguments' : {}}]}
+
+@pytest.fixture
+def extraction_service(monkeypatch):
+    monkeypatch.setattr(service, 'BatchEngine', StubEngine)
+    return ExtractionService(batch_size=4, max_latency=0.05)
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def test_requests_batched(extraction_service):
+    async def scenario():
+        await extraction_service.start()
+        outputs = await asyncio.gather(*(extraction_service.extract('doc{}'.format(k), 'text {}'.format(k)) for k in range(6)))
+        await extraction_service.stop()
+        return outputs
+
+    outputs = run(scenario())
+    # every caller gets the output of its own article
+    assert [output['document'] for output in outputs] == ['doc{}'.format(k) for k in range(6)]
+    assert [output['extractions'][0]['sentences'] for output in outputs] == ['text {}'.format(k) for k in range(6)]
+    assert extraction_service._engine.batches == [4, 2]
+    assert (extraction_service.batches, extraction_service.articles) == (2, 6)
+
+def test_failed_batch(extraction_service):
+    async def scenario():
+        await extraction_service.start()
+        outputs = await asyncio.gather(extraction_service.extract('a', 'fail'), extraction_service.extract('b', 'ok'),
+                return_exceptions=True)
+        # the batcher keeps serving after a failed batch
+        outputs.append(await extraction_service.extract('c', 'ok'))
+        await extraction_service.stop()
+        return outputs
+
+    outputs = run(scenario())
+    assert all(isinstance(output, RuntimeError) for output in outputs[:2])
+    assert outputs[2]['document'] == 'c'
+
+async def request(port, data):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body.decode('utf-8'))
+
+def post(path, body, content_type='text/plain'):
+    return ('POST {} HTTP/1.1\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+            path, content_type, len(body))).encode('latin-1') + body
+
+def test_http(extraction_service):
+    async def scenario():
+        await extraction_service.start()
+        server = await asyncio.start_server(HTTPServer(extraction_service, max_body=100).handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        responses = [await request(port, post('/extract', b'plain text')),
+                await request(port, post('/extract', json.dumps({'title' : 'T', 'text' : 'json'}).encode('utf-8'), 'application/json')),
+                await request(port, post('/extract', b'{"title": "T"}', 'application/json')),
+                await request(port, post('/extract', b'x' * 101)),
+                await request(port, post('/other', b'')),
+                await request(port, b'GET /extract HTTP/1.1\r\nConnection: close\r\n\r\n'),
+                await request(port, b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n')]
+        server.close()
+        await server.wait_closed()
+        await extraction_service.stop()
+        return responses
+
+    responses = run(scenario())
+    assert responses[0] == (200, {'document' : 'request-1', 'extractions' : [{'template' : 'T', 'sentences' : 'plain text', 'arguments' : {}}]})
+    assert responses[1][0] == 200 and responses[1][1]['document'] == 'T'
+    assert [status for status, payload in responses[2:6]] == [400, 413, 404, 405]
+    assert responses[6] == (200, {'status' : 'ok', 'pending' : 0, 'batches' : 2, 'articles' : 2})
@@ -0,0 +1,70 @@
+# import dependencies
+import json
+import os
+
+from storage import JsonlWriter, Checkpoint, content_hash, repair_jsonl, read_jsonl, latest_by_document, compact_jsonl
+
+def write_run(path, manifest, documents):
+    """
+    Records and manifest of a run over the given documents
+    """
+    checkpoint = Checkpoint(manifest, version='v1')
+    with JsonlWriter(path, flush_every=1, checkpoint=checkpoint) as writer:
+        for document in documents:
+            writer.write({'document' : document, 'extractions' : []})
+            checkpoint.add(document, content_hash(document))
+
+def test_repair_truncated_line(tmpdir):
+    path = os.path.join(str(tmpdir), 'output.jsonl')
+    manifest = os.path.join(str(tmpdir), 'output.manifest.jsonl')
+    write_run(path, manifest, ['A', 'B'])
+    # killed in the middle of writing C
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('{"document": "C", "extra')
+
+    repair_jsonl(path)
+    assert [record['document'] for record in read_jsonl(path)] == ['A', 'B']
+    repair_jsonl(path)    # nothing left to repair
+    assert [record['document'] for record in read_jsonl(path)] == ['A', 'B']
+
+def test_checkpoint_resume(tmpdir):
+    path = os.path.join(str(tmpdir), 'output.jsonl')
+    manifest = os.path.join(str(tmpdir), 'output.manifest.jsonl')
+    write_run(path, manifest, ['A', 'B'])
+    with open(manifest, 'a', encoding='utf-8') as file:
+        file.write('{"document": "C", "ha')
+
+    checkpoint = Checkpoint(manifest, resume=True, version='v1')
+    assert sorted(checkpoint.documents()) == ['A', 'B']
+    assert checkpoint.done('A', content_hash('A'))
+    assert not checkpoint.done('A', content_hash('changed'))
+    assert not checkpoint.done('C', content_hash('C'))
+    checkpoint.add('C', content_hash('C'))
+    checkpoint.close()
+    assert [record['document'] for record in read_jsonl(manifest)] == ['A', 'B', 'C']
+
+    # another pipeline version has nothing done
+    checkpoint = Checkpoint(manifest, resume=True, version='v2')
+    assert not checkpoint.done('A', content_hash('A'))
+    checkpoint.close()
+
+    # a new run starts a new manifest
+    Checkpoint(manifest, version='v1').close()
+    assert os.path.getsize(manifest) == 0
+
+def test_latest_by_document(tmpdir):
+    path = os.path.join(str(tmpdir), 'output.jsonl')
+    with open(path, 'w', encoding='utf-8') as file:
+        for document, version in [('A', 1), ('B', 1), ('A', 2), ('C', 1), ('B', 2)]:
+            file.write(json.dumps({'document' : document, 'version' : version}) + '\n')
+    assert [(record['document'], record['version']) for record in latest_by_document(path)] == [('A', 2), ('C', 1), ('B', 2)]
+
+def test_compact_jsonl(tmpdir):
+    path = os.path.join(str(tmpdir), 'output.jsonl')
+    with open(path, 'w', encoding='utf-8') as file:
+        for document, version in [('A', 1), ('B', 1), ('C', 1), ('B', 2)]:
+            file.write(json.dumps({'document' : document, 'version' : version}) + '\n')
+    # latest record of the current documents, in their order, deleted ones dropped
+    assert compact_jsonl(path, ['B', 'C', 'D']) == 2
+    assert [(record['document'], record['version']) for record in read_jsonl(path)] == [('B', 2), ('C', 1)]
+    assert not os.path.exists(path + '.tmp')
@@ -0,0 +1,72 @@
+# import dependencies
+import pytest
+
+from features import TEMPLATES, resolve
+from templates import TemplateEngine
+from parses import build
+
+# John Smith was born in New York in 1990 .
+BORN = [('John', 'john', 'compound', 1, 'PERSON'), ('Smith', 'smith', 'nsubjpass', 3, 'PERSON'), ('was', 'be', 'auxpass', 3, ''),
+        ('born', 'bear', 'ROOT', 3, ''), ('in', 'in', 'prep', 3, ''), ('New', 'new', 'compound', 6, 'GPE'),
+        ('York', 'york', 'pobj', 4, 'GPE'), ('in', 'in', 'prep', 3, ''), ('1990', '1990', 'pobj', 7, 'DATE'), ('.', '.', 'punct', 3, '')]
+
+# Google bought YouTube in 2006 .
+BUY = [('Google', 'google', 'nsubj', 1, 'ORG'), ('bought', 'buy', 'ROOT', 1, ''), ('YouTube', 'youtube', 'dobj', 1, 'ORG'),
+        ('in', 'in', 'prep', 1, ''), ('2006', '2006', 'pobj', 3, 'DATE'), ('.', '.', 'punct', 1, '')]
+
+# Santa Clara is in California .
+PART_OF = [('Santa', 'santa', 'compound', 1, 'GPE'), ('Clara', 'clara', 'nsubj', 2, 'GPE'), ('is', 'be', 'ROOT', 2, ''),
+        ('in', 'in', 'prep', 2, ''), ('California', 'california', 'pobj', 3, 'GPE'), ('.', '.', 'punct', 2, '')]
+
+EXPECTED = {'BORN' : {'1' : 'John Smith', '2' : '1990', '3' : 'New York'},
+        'BUY' : {'1' : 'Google', '2' : 'YouTube', '3' : '2006'},
+        'PART_OF' : {'1' : 'Santa Clara', '2' : 'California'}}
+
+@pytest.mark.parametrize('name', list(TEMPLATES))
+def test_template_alone(name):
+    # only the features declared by the template are computed, as with main.py -t <name>
+    features = build([BORN, BUY, PART_OF], resolve([name]))
+    extractions = TemplateEngine([TEMPLATES[name]]).fill(['born', 'buy', 'part of'], features)
+    assert [(e['template'], e['arguments']) for e in extractions] == [(name, EXPECTED[name])]
+
+def test_templates_together():
+    features = build([BORN, BUY, PART_OF], resolve(None))
+    extractions = TemplateEngine(list(TEMPLATES.values())).fill(['born', 'buy', 'part of'], features)
+    assert [(e['template'], e['arguments']) for e in extractions] == list(EXPECTED.items())
+
+# The founder of Apple left . He was born in Ohio .
+FOUNDER = [('The', 'the', 'det', 1, ''), ('founder', 'founder', 'nsubj', 4, ''), ('of', 'of', 'prep', 1, ''),
+        ('Apple', 'apple', 'pobj', 2, 'ORG'), ('left', 'leave', 'ROOT', 4, ''), ('.', '.', 'punct', 4, '')]
+HE = [('He', 'he', 'nsubjpass', 2, ''), ('was', 'be', 'auxpass', 2, ''), ('born', 'bear', 'ROOT', 2, ''),
+        ('in', 'in', 'prep', 2, ''), ('Ohio', 'ohio', 'pobj', 3, 'GPE'), ('.', '.', 'punct', 2, '')]
+
+def test_coref_named_from_mention_head():
+    # "Apple" is inside the mention "The founder of Apple" but is not its head
+    features = build([FOUNDER, HE], resolve(['BORN']), coref=[[(0, 4), (6, 7)]])
+    assert features.resolve(1, 0) is None
+    assert TemplateEngine([TEMPLATES['BORN']]).fill(['founder', 'born'], features) == []
+
+    features = build([BORN, HE], resolve(['BORN']), coref=[[(0, 2), (10, 11)]])
+    assert features.resolve(1, 0) == ('John Smith', 'PERSON')
+    extractions = TemplateEngine([TEMPLATES['BORN']]).fill(['born', 'he'], features)
+    assert [e['arguments'] for e in extractions] == [EXPECTED['BORN'], {'1' : 'John Smith', '2' : None, '3' : 'Ohio'}]
+
+# He was born Mary Jones .
+RENAMED = [('He', 'he', 'nsubjpass', 2, ''), ('was', 'be', 'auxpass', 2, ''), ('born', 'bear', 'ROOT', 2, ''),
+        ('Mary', 'mary', 'compound', 4, 'PERSON'), ('Jones', 'jones', 'oprd', 2, 'PERSON'), ('.', '.', 'punct', 2, '')]
+
+def test_coref_only_without_path_entity():
+    features = build([BORN, RENAMED], resolve(['BORN']), coref=[[(0, 2), (10, 11)]])
+    extractions = TemplateEngine([TEMPLATES['BORN']]).fill(['born', 'renamed'], features)
+    assert extractions[1]['arguments']['1'] == 'Mary Jones'
+
+# Google bought YouTube and DoubleClick in 2007 .
+BUY_TWO = [('Google', 'google', 'nsubj', 1, 'ORG'), ('bought', 'buy', 'ROOT', 1, ''), ('YouTube', 'youtube', 'dobj', 1, 'ORG'),
+        ('and', 'and', 'cc', 2, ''), ('DoubleClick', 'doubleclick', 'conj', 2, 'ORG'), ('in', 'in', 'prep', 4, ''),
+        ('2007', '2007', 'pobj', 5, 'DATE'), ('.', '.', 'punct', 1, '')]
+
+def test_dates_assigned_to_closest_org():
+    # the date modifies DoubleClick, the closest org in the tree, not the first one in the sentence
+    features = build([BUY_TWO], resolve(['BUY']))
+    extractions = TemplateEngine([TEMPLATES['BUY']]).fill(['bought'], features)
+    assert [e['arguments'] for e in extractions] == [{'1' : 'Google', '2' : 'DoubleClick', '3' : '2007'}]
@@ -0,0 +1,39 @@
+# import dependencies
+import pytest
+
+from windows import split_windows
+
+SENTENCE = 'John Smith was born in New York in 1990. '
+TEXT = '\n'.join(SENTENCE * 5 for _ in range(20))
+
+def test_short_text_one_window():
+    assert split_windows('Short text.', max_chars=100) == [(0, 0, 11)]
+    assert split_windows('', max_chars=100) == [(0, 0, 0)]
+
+@pytest.mark.parametrize('max_chars, overlap_chars', [(300, 100), (300, 0), (120, 500), (50, 10)])
+def test_windows_cover_text(max_chars, overlap_chars):
+    windows = split_windows(TEXT, max_chars, overlap_chars)
+    assert len(windows) > 1
+    # the bodies follow each other and cover the whole text
+    assert windows[0][:2] == (0, 0)
+    assert windows[-1][2] == len(TEXT)
+    for (start, body, end), (next_start, next_body, next_end) in zip(windows, windows[1:]):
+        assert next_body == end
+    for start, body, end in windows:
+        assert start <= body < end
+        assert end - start <= max_chars
+        assert body - start <= min(overlap_chars, max_chars // 2)
+
+def test_cut_at_paragraph_then_sentence():
+    paragraph = len(SENTENCE * 5) + 1
+    windows = split_windows(TEXT, max_chars=paragraph + 50, overlap_chars=0)
+    assert all(TEXT[end - 1] == '\n' for start, body, end in windows[:-1])
+
+    windows = split_windows(TEXT, max_chars=100, overlap_chars=0)
+    assert all(TEXT[body:].startswith('John') for start, body, end in windows)
+
+def test_context_starts_at_sentence():
+    windows = split_windows(TEXT, max_chars=200, overlap_chars=60)
+    for start, body, end in windows[1:]:
+        assert start < body
+        assert TEXT[start:].startswith('John')
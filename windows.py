@@ -0,0 +1,65 @@
+# import dependencies
+import re
+
+# boundaries a window may be cut at, most preferred first: paragraph, sentence, whitespace
+PARAGRAPH_END = re.compile(r'\n\s*')
+SENTENCE_END = re.compile(r'[.!?][\'")\]]*\s+')
+WHITESPACE = re.compile(r'\s+')
+
+def _last_boundary(text, lo, hi, pattern):
+    """
+    Position right after the last boundary matched in text[lo:hi], None if there is none
+    """
+    end = None
+    for match in pattern.finditer(text, lo, hi):
+        if match.end() < hi:
+            end = match.end()
+    return end
+
+def _first_boundary(text, lo, hi, pattern):
+    """
+    Position right after the first boundary matched in text[lo:hi], None if there is none
+    """
+    match = pattern.search(text, lo, hi)
+    return match.end() if match is not None else None
+
+def split_windows(text, max_chars=100000, overlap_chars=2000):
+    """
+    Split a long text into bounded windows cut at paragraph or sentence boundaries
+    Each window but the first starts with up to overlap_chars of context: whole sentences taken from
+    the end of the previous window, so coreference can reach back across the cut.
+    Args:
+        text : str
+        max_chars : int
+            Maximum length of a window, context included
+        overlap_chars : int
+            Maximum length of the context, at most half of max_chars
+    Returns:
+        windows : list of (int, int, int)
+            (start, body, end) character offsets of each window: the window is text[start:end] and its
+            own sentences start at body, text[start:body] being the context
+    """
+    if len(text) <= max_chars:
+        return [(0, 0, len(text))]
+    overlap_chars = min(overlap_chars, max_chars // 2)
+    size = max_chars - overlap_chars
+
+    windows = []
+    body = 0
+    while body < len(text):
+        end = min(body + size, len(text))
+        if end < len(text):
+            for pattern in (PARAGRAPH_END, SENTENCE_END, WHITESPACE):
+                cut = _last_boundary(text, body, end, pattern)
+                if cut is not None and cut > body:
+                    end = cut
+                    break
+
+        start = body
+        if body > 0 and overlap_chars > 0:
+            context = _first_boundary(text, body - overlap_chars, body, SENTENCE_END)
+            if context is not None:
+                start = context
+        windows.append((start, body, end))
+        body = end
+    return windows